@@ -0,0 +1,122 @@
+import sys
+import time
+import numpy as np
+import pandas as pd
+from src.data_access import default_window, load_player_data, load_match_data
+from src.sql_backend import load_player_database, load_match_database
+
+# Runs the dashboard's queries against the pandas and the DuckDB backends,
+# checks that they return the same frames and prints the time each took.
+# Float values are compared at the precision the dashboard shows them with
+# (the pandas frames hold float32 columns, DuckDB computes in float64).
+#
+#   python -m bench.backend_parity [games_per_player]
+
+PLAYER_METRICS = [
+    'kdr', 'adr', 'matou', 'morreu', 'multikills', 'firstkills', 'headshotrate', 'bomb_planted',
+    'bomb_defused', 'matches', 'killsPerMap', 'deatchsPerMap', 'firstKillsPerMap',
+    'bombPlantedPerMap', 'bombDefusedPerMap',
+]
+
+MATCH_COLUMNS = [
+    'game_id', 'nick', 'team', 'updated_at', 'map_name', 'nb_kill', 'assist', 'death', 'hs', 'damage',
+    'adr', 'kdr', 'phs', 'firstkill', 'pkast', 'hits', 'level', 'rating', 'flash_assist', 'multikills',
+    'damage_share', 'kills_share', 'hits_share', 'damage_hits',
+    'adr_last10', 'kdr_last10', 'rating_last10', 'adr_ewma', 'kdr_ewma', 'rating_ewma',
+]
+
+SORTS = [('updated_at',), ('game_id', 'team', 'nick'), ('damage_share',), ('map_name',)]
+
+
+def same(left, right, what):
+    # Compared as displayed: float64 rounded to two decimals, strings as str
+    def normalize(df):
+        df = df.copy()
+        for column in df.columns:
+            if pd.api.types.is_float_dtype(df[column].dtype) or pd.api.types.is_integer_dtype(df[column].dtype):
+                df[column] = df[column].astype('float64').round(2)
+            elif not pd.api.types.is_datetime64_any_dtype(df[column].dtype):
+                df[column] = df[column].astype(str)
+        df.columns = [str(column) for column in df.columns]
+        df.index = [str(label) for label in df.index]
+        return df
+    try:
+        pd.testing.assert_frame_equal(normalize(left), normalize(right), check_dtype=False)
+    except AssertionError as e:
+        raise AssertionError(f"{what}: {e}")
+
+
+def timed(label, timings, function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    timings[label] = timings.get(label, 0.0) + time.perf_counter() - start
+    return result
+
+
+def compare_players(pandas_data, sql_data, timings):
+    assert pandas_data.cube.players == sql_data.cube.players
+    players = pandas_data.cube.players
+    selections = [players, players[:1], players[1::2], []]
+    for metric in PLAYER_METRICS:
+        for selected in selections:
+            for name, data in (('pandas', pandas_data), ('duckdb', sql_data)):
+                timed(f'{name} chart', timings, data.cube.chart, metric, selected)
+                timed(f'{name} stats', timings, data.cube.stats, metric, selected)
+            same(pandas_data.cube.chart(metric, selected), sql_data.cube.chart(metric, selected), f'chart {metric}')
+            same(pandas_data.cube.stats(metric, selected), sql_data.cube.stats(metric, selected), f'stats {metric}')
+
+
+def compare_matches(pandas_data, sql_data, timings, games_per_player):
+    lookup, sql_lookup = pandas_data.lookup, sql_data.lookup
+    assert lookup.players == sql_lookup.players
+    assert lookup.games == sql_lookup.games
+
+    for nick in lookup.players:
+        games = lookup.player_games(nick)
+        assert games == sql_lookup.player_games(nick)
+        games = games[-games_per_player:]
+
+        rows = timed('pandas filter', timings, lookup.player_rows, nick, games)
+        sql_rows = timed('duckdb filter', timings, sql_lookup.player_rows, nick, games)
+        assert np.array_equal(rows, sql_rows), nick
+
+        same(pandas_data.frame(MATCH_COLUMNS, rows), sql_data.frame(MATCH_COLUMNS, rows), f'frame {nick}')
+        same(
+            timed('pandas summary', timings, pandas_data.summary, MATCH_COLUMNS[5:], rows),
+            timed('duckdb summary', timings, sql_data.summary, MATCH_COLUMNS[5:], rows),
+            f'summary {nick}'
+        )
+        for sort in SORTS:
+            for descending in (False, True):
+                page = timed('pandas page', timings, pandas_data.sorted_rows, rows, sort, descending, 0, 50)
+                sql_page = timed('duckdb page', timings, sql_data.sorted_rows, rows, sort, descending, 0, 50)
+                assert np.array_equal(page, sql_page), (nick, sort, descending)
+
+    games = lookup.games[-games_per_player:]
+    rows = lookup.game_rows(games)
+    assert np.array_equal(rows, sql_lookup.game_rows(games))
+    assert lookup.players_in(rows) == sql_lookup.players_in(rows)
+    kept = lookup.keep_players(rows, lookup.players[::2])
+    assert np.array_equal(kept, sql_lookup.keep_players(rows, lookup.players[::2]))
+
+
+def main(games_per_player=25):
+    timings = {}
+    # Whole history, then the month window a new session opens on
+    for window in dict.fromkeys([None, default_window()]):
+        months = 'all' if window is None else f'{window[0]}..{window[1]}'
+        pandas_players = timed(f'pandas load players {months}', timings, load_player_data, window)
+        sql_players = timed(f'duckdb load players {months}', timings, load_player_database, window)
+        compare_players(pandas_players, sql_players, timings)
+
+        pandas_matches = timed(f'pandas load matches {months}', timings, load_match_data, window)
+        sql_matches = timed(f'duckdb load matches {months}', timings, load_match_database, window)
+        compare_matches(pandas_matches, sql_matches, timings, games_per_player)
+
+    print("Backends return the same frames")
+    for label, seconds in sorted(timings.items()):
+        print(f"{label:40s} {seconds * 1000:9.1f} ms")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 25)
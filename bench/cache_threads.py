@@ -0,0 +1,55 @@
+import os
+import sys
+import shutil
+import tempfile
+import threading
+from loader.response_cache import ResponseCache
+
+# Checks that fetcher threads storing the same response body at once (e.g.
+# several empty months) all succeed: each put() must return without error,
+# every request must read back its body and no temp file may be left over.
+#
+#   python -m bench.cache_threads [rounds] [threads]
+
+
+def store_together(cache, body, threads):
+    # `threads` puts of the same body, released together
+    barrier = threading.Barrier(threads)
+    errors = []
+
+    def put(i):
+        barrier.wait()
+        try:
+            cache.put(f'https://api.example/matches?month={i}', body)
+        except Exception as e:
+            errors.append(e)
+
+    workers = [threading.Thread(target=put, args=(i,)) for i in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return errors
+
+
+def main(rounds=200, threads=16):
+    work = tempfile.mkdtemp(prefix='gc-cache-')
+    try:
+        for n in range(rounds):
+            for compress in (True, False):
+                cache = ResponseCache(os.path.join(work, f'{n}-{compress}'), compress=compress)
+                body = f'{{"round": {n}, "matches": []}}'.encode()
+                errors = store_together(cache, body, threads)
+                if errors:
+                    raise AssertionError(f"round {n}: {len(errors)} of {threads} puts failed: {errors[0]!r}")
+                for i in range(threads):
+                    assert cache.get(f'https://api.example/matches?month={i}') == body, f"round {n}: request {i} reads back wrong"
+                left = [name for _, _, names in os.walk(cache.directory) for name in names if name.endswith('.tmp')]
+                assert not left, f"round {n}: temp files left: {left}"
+        print(f"{rounds} rounds of {threads} threads storing one body: ok")
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:3]))
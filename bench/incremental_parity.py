@@ -0,0 +1,251 @@
+import os
+import json
+import shutil
+import argparse
+import tempfile
+import numpy as np
+import pandas as pd
+
+# Checks that the incremental refresh gives the same datasets as a full load.
+# A copy of the data directory gets batches of matches appended to its store:
+# new players in new games, players joining games already loaded, matches
+# older than a player's last one, rows already loaded, and matches before the
+# month window (which must load it in full). After each batch the updated
+# version (MatchData.append: carry_over, the index merge, PlayerForm.extended,
+# ranks) is compared with a fresh load of the same files. The form values of
+# a window load are compared with those of the whole history, before and
+# after matches are added before it. The player cube update is checked from
+# an older version with added, changed and removed players.
+#
+#   python -m bench.incremental_parity [--data src] [--window all|latest]
+#
+# The data directory itself is never written to.
+
+SORTS = [('updated_at',), ('game_id', 'team', 'nick'), ('damage_share',), ('map_name',)]
+
+BATCH_ROWS = 50
+
+
+def same_values(left, right, what):
+    # Exact values, dtypes may differ (compact_frame picks them per load)
+    left, right = np.asarray(left), np.asarray(right)
+    if left.dtype.kind in 'fc' or right.dtype.kind in 'fc':
+        equal = len(left) == len(right) and np.array_equal(left.astype('float64'), right.astype('float64'), equal_nan=True)
+    else:
+        equal = len(left) == len(right) and np.array_equal(left.astype(object), right.astype(object))
+    if not equal:
+        raise AssertionError(f"{what} differs")
+
+
+def plain(df):
+    # Labels as plain objects: an update may hold them in another index type
+    df = df.copy()
+    df.index = pd.Index(df.index.tolist(), dtype=object)
+    if not isinstance(df.columns, pd.MultiIndex):
+        df.columns = pd.Index(df.columns.tolist(), dtype=object)
+    return df
+
+
+def compare_matches(updated, full, label):
+    from src.metrics import MATCH_METRICS
+    from src.form import FORM_METRICS
+
+    assert list(updated.df.columns) == list(full.df.columns), label
+    for column in full.df.columns:
+        values = full.df[column]
+        # Missing values compare as None whatever the dtype holds them as
+        same_values(
+            updated.df[column].astype(object).where(updated.df[column].notna(), None),
+            values.astype(object).where(values.notna(), None),
+            f'{label}: column {column}'
+        )
+    for name in MATCH_METRICS:
+        same_values(updated.get(name), full.get(name), f'{label}: metric {name}')
+    for name in FORM_METRICS:
+        same_values(updated.get(name), full.get(name), f'{label}: form {name}')
+        same_values(updated.form._values[name], full.form._values[name], f'{label}: unrounded form {name}')
+
+    lookup, full_lookup = updated.lookup, full.lookup
+    assert lookup.players == full_lookup.players, f'{label}: index players'
+    assert lookup.games == full_lookup.games, f'{label}: index games'
+    for nick in full_lookup.players:
+        same_values(lookup.player_rows(nick), full_lookup.player_rows(nick), f'{label}: rows of {nick}')
+        assert lookup.player_games(nick) == full_lookup.player_games(nick), f'{label}: games of {nick}'
+    same_values(lookup.game_rows(full_lookup.games), full_lookup.game_rows(full_lookup.games), f'{label}: game rows')
+
+    for columns in SORTS:
+        same_values(updated.rank(columns), full.rank(columns), f'{label}: rank {columns}')
+
+
+def compare_with_history(data, label):
+    # Form values of a month window are those of the players' whole history;
+    # its leads come from the saved ones when they are still current
+    from src.data_access import load_match_data
+    from src.form import FORM_METRICS
+
+    full = load_match_data()
+    keys = pd.MultiIndex.from_frame(full.df[['game_id', 'nick']].astype({'nick': object}))
+    positions = keys.get_indexer(pd.MultiIndex.from_frame(data.df[['game_id', 'nick']].astype({'nick': object})))
+    assert (positions >= 0).all(), f'{label}: rows missing from the whole history'
+    for name in FORM_METRICS:
+        data.get(name), full.get(name)
+        same_values(data.form._values[name], full.form._values[name][positions], f'{label}: form {name} against the whole history')
+
+
+def warm(data):
+    # Everything a session may have computed, so the update carries it over
+    from src.metrics import MATCH_METRICS
+    from src.form import FORM_METRICS
+    for name in list(MATCH_METRICS) + list(FORM_METRICS):
+        data.get(name)
+    for columns in SORTS:
+        data.rank(columns)
+
+
+def batches(df, window, rng):
+    # (label, rows) batches of new matches built from rows of `df`, the
+    # match table of the window
+    from src.partitions import window_bounds
+    start, end = (df['updated_at'].min(), df['updated_at'].max() + pd.Timedelta(seconds=1)) if window is None else window_bounds(window)
+    games = df.drop_duplicates('game_id')
+    next_game = int(df['game_id'].max()) + 1
+    template = df.sample(BATCH_ROWS, random_state=int(rng.integers(1 << 31)), replace=len(df) < BATCH_ROWS).reset_index(drop=True)
+
+    # New players in new games, at the end of the window
+    rows = template.copy()
+    rows['nick'] = [f'new_player_{i % 10:02d}' for i in range(len(rows))]
+    rows['game_id'] = next_game + np.arange(len(rows)) // 5
+    rows['updated_at'] = end - pd.Timedelta(hours=1)
+    yield 'new players', rows
+    next_game += len(rows)
+
+    # Loaded games gaining players, existing and new ones
+    joined = games.sample(min(len(games), 10), random_state=int(rng.integers(1 << 31)))
+    rows = template.iloc[:len(joined)].copy()
+    rows['game_id'] = joined['game_id'].to_numpy()
+    rows['updated_at'] = joined['updated_at'].to_numpy()
+    nicks = df['nick'].astype(str).unique()
+    rows['nick'] = [nicks[i % len(nicks)] if i % 2 else f'joined_player_{i}' for i in range(len(rows))]
+    yield 'players joining loaded games', rows
+
+    # New games of existing players, older than their last match
+    rows = template.copy()
+    rows['game_id'] = next_game + np.arange(len(rows))
+    rows['updated_at'] = start + (rows['updated_at'] - start) / 2
+    yield 'older matches', rows
+    next_game += len(rows)
+
+    # Rows already loaded are dropped
+    yield 'rows already loaded', df.sample(min(len(df), 10), random_state=int(rng.integers(1 << 31)))
+
+
+def check_matches(window, rng):
+    from src.data_access import load_match_data, update_match_data
+    from src.match_store import append_matches
+    from src.schema import MATCH_DTYPES
+
+    label = 'all' if window is None else f'{window[0]}..{window[1]}'
+    data = load_match_data(window)
+    if data is None or data.df.empty:
+        print(f"matches {label}: no rows, skipped")
+        return
+    for what, rows in batches(data.df, window, rng):
+        warm(data)
+        append_matches(rows.astype({'nick': 'string'})[list(MATCH_DTYPES)])
+        updated = update_match_data(data, window)
+        assert updated is not None, f"{label}: {what} did not update incrementally"
+        compare_matches(updated, load_match_data(window), f'matches {label} after {what}')
+        print(f"matches {label}: {what} ok ({len(updated.df)} rows)")
+        data = updated
+
+    if window is not None:
+        compare_with_history(data, f'matches {label}')
+        # Matches before the window change the form leads: a full load is needed
+        rows = data.df.head(5).copy()
+        rows['game_id'] = int(data.df['game_id'].max()) + 1000 + np.arange(len(rows))
+        rows['updated_at'] = pd.Timestamp(window[0]) - pd.Timedelta(days=40)
+        append_matches(rows.astype({'nick': 'string'})[list(MATCH_DTYPES)])
+        assert update_match_data(data, window) is None, f"{label}: matches before the window were not reloaded"
+        compare_with_history(load_match_data(window), f'matches {label} after matches before it')
+        print(f"matches {label}: matches before the window reload it ok")
+
+
+def check_players(window, rng):
+    from src.data_access import PlayerData, load_player_data, update_player_data
+
+    label = 'all' if window is None else f'{window[0]}..{window[1]}'
+    full = load_player_data(window)
+    if full is None or full.df.empty:
+        print(f"players {label}: no rows, skipped")
+        return
+
+    # An older version: some players missing (added since), some values
+    # different (changed since) and a player removed since
+    df = full.df
+    players = df['nome'].dropna().unique()
+    picked = rng.choice(players, size=min(len(players), 6), replace=False)
+    older = df[~df['nome'].isin(picked[:3])].reset_index(drop=True)
+    changed = older['nome'].isin(picked[3:])
+    for column in ['kdr', 'adr']:
+        older[column] = older[column].where(~changed, older[column] * 2)
+    removed = older.head(2).assign(nome='removed_player')
+    older = pd.concat([older, removed], ignore_index=True)
+
+    previous = PlayerData(older)
+    updated = update_player_data(previous, window)
+    cube, full_cube = updated.cube, full.cube
+    assert cube.players == full_cube.players, f'players {label}: players'
+    for metric, pivot in full_cube.monthly.items():
+        pd.testing.assert_frame_equal(plain(cube.monthly[metric]), plain(pivot), check_dtype=False, check_names=False, obj=f'players {label}: monthly {metric}')
+    pd.testing.assert_frame_equal(plain(cube.summary), plain(full_cube.summary), check_dtype=False, check_names=False, obj=f'players {label}: summary')
+    print(f"players {label}: added, changed and removed players ok")
+
+
+def point_snapshots(copy):
+    # Snapshot metadata names the workbook it was built from; the copies are
+    # pointed at the copied workbooks (same size and mtime) so they stay current
+    snapshots = os.path.join(copy, '.snapshots')
+    if not os.path.isdir(snapshots):
+        return
+    for name in os.listdir(snapshots):
+        if not name.endswith('.json'):
+            continue
+        path = os.path.join(snapshots, name)
+        with open(path) as f:
+            meta = json.load(f)
+        meta['source'] = os.path.join(copy, os.path.basename(meta['source']))
+        with open(path, 'w') as f:
+            json.dump(meta, f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare incremental refreshes with full loads")
+    parser.add_argument('--data', default=os.environ.get('GC_DATA_DIR', 'src'), help="data directory, copied before anything is appended")
+    parser.add_argument('--window', choices=['all', 'latest'], action='append', help="month windows to check (default: both)")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    work = tempfile.mkdtemp(prefix='gc-incremental-')
+    try:
+        copy = os.path.join(work, 'data')
+        # The DuckDB databases are not needed, the snapshots save a rebuild
+        shutil.copytree(args.data, copy, ignore=shutil.ignore_patterns('*.duckdb', '*.tmp', '__pycache__', '*.py'))
+        point_snapshots(copy)
+        # Imported here so GC_DATA_DIR is already set when the paths are resolved
+        os.environ['GC_DATA_DIR'] = copy
+        from src.data_read import data_months
+        from src.match_data import match_months
+        from src.partitions import last_months
+
+        rng = np.random.default_rng(args.seed)
+        for name in args.window or ['all', 'latest']:
+            # The latest months of each source, they need not be the same ones
+            check_players(None if name == 'all' else last_months(data_months(), 3), rng)
+            check_matches(None if name == 'all' else last_months(match_months(), 3), rng)
+        print("Incremental refreshes match full loads")
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+import gc
+import sys
+import resource
+import tracemalloc
+from collections import Counter
+from streamlit.testing.v1 import AppTest
+
+# Opens N headless sessions of the dashboard in one process and prints the
+# resident memory as they accumulate. Every session stays alive, like open
+# browser tabs, so per-session copies of the data would show up as growth.
+# An empty app is measured the same way first, to separate the test
+# harness's own per-session cost from the dashboard's.
+# To tell what the remaining growth is, the dashboard is measured twice: first
+# with each session's element tree (the rendered tables and charts AppTest
+# keeps, where a browser would hold them) dropped after its run, then with
+# the trees kept. The Python allocations made by the sessions are also traced
+# and grouped by package.
+# The dataset objects alive at the end are counted: one per dataset (and
+# month window) means no session holds a copy of its own.
+#
+#   python -m bench.session_memory [max_sessions]
+
+CHECKPOINTS = (1, 5, 10, 25, 50, 100)
+
+
+def rss_mb():
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # Peak RSS where /proc is not available (KiB on Linux, bytes on macOS)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def measure(label, open_session, max_sessions, keep_tree=True):
+    sessions = []
+    start = None
+    for n in range(1, max_sessions + 1):
+        at = open_session().run()
+        if at.exception:
+            raise RuntimeError(at.exception)
+        if not keep_tree:
+            at._tree = None
+        sessions.append(at)
+        if n in CHECKPOINTS or n == max_sessions:
+            gc.collect()
+            rss = rss_mb()
+            start = rss if start is None else start
+            print(f"{label:22s} {n:4d} sessions  {rss:8.1f} MB  (+{rss - start:.1f} MB)")
+    return sessions
+
+
+def dataset_objects():
+    # Live dataset objects by class, each counted once by id()
+    names = {'PlayerData', 'MatchData', 'SqlPlayerData', 'SqlMatchData', 'PlayerCube', 'PlayerForm', 'MatchIndex'}
+    seen = {id(obj): type(obj).__name__ for obj in gc.get_objects() if type(obj).__name__ in names}
+    return Counter(seen.values())
+
+
+def package(filename):
+    # Top-level package of an allocating file, the dashboard's own code as is
+    parts = filename.replace('\\', '/').split('/')
+    if 'site-packages' in parts:
+        return parts[parts.index('site-packages') + 1]
+    if 'src' in parts or filename.endswith('main.py'):
+        return 'dashboard'
+    return 'python'
+
+
+def traced_growth(open_session, max_sessions):
+    # Python allocations still alive after sessions 2..N, by package. The
+    # first session runs untraced, it loads the shared data
+    sessions = [open_session().run()]
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    for _ in range(max_sessions - 1):
+        sessions.append(open_session().run())
+    gc.collect()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    growth = Counter()
+    for stat in after.compare_to(before, 'filename'):
+        growth[package(stat.traceback[0].filename)] += stat.size_diff
+    total = sum(growth.values())
+    print(f"traced growth over {max_sessions - 1} sessions: {total / 2 ** 20:.1f} MB ({total / (max_sessions - 1) / 1024:.0f} KB per session)")
+    for name, size in growth.most_common(5):
+        print(f"  {name:20s} {size / 2 ** 20:6.1f} MB")
+    return sessions
+
+
+def main(max_sessions=50):
+    measure('empty app', lambda: AppTest.from_string("import streamlit as st\nst.write('')"), max_sessions)
+    dashboard = lambda: AppTest.from_file('../main.py', default_timeout=120)
+    # Without trees first, so it cannot reuse memory the kept trees freed
+    sessions = measure('dashboard, no trees', dashboard, max_sessions, keep_tree=False)
+    sessions += measure('dashboard', dashboard, max_sessions)
+    print("dataset objects alive:", dict(sorted(dataset_objects().items())))
+    del sessions
+    gc.collect()
+    traced_growth(dashboard, max_sessions)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50)
@@ -0,0 +1,222 @@
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import statistics
+
+# Times the loaders and the dashboard's filter/aggregate paths on a generated
+# dataset (see bench/synthetic.py), then runs the dashboard headlessly with
+# AppTest. Medians are compared with the baseline stored for the same dataset
+# in bench/baselines.json.
+#
+#   python -m bench.synthetic --players 1000 --match-rows 100000 --format parquet
+#   python -m bench.suite --data bench/data [--save] [--check]
+#
+# Baselines are only comparable on the machine that recorded them.
+
+BASELINES = os.path.join(os.path.dirname(__file__), 'baselines.json')
+
+# Version of each case group (the name up to the first dot). Bump it when
+# what the group's cases measure changes, e.g. the dashboard showing other
+# data by default; baselines recorded with another version are not compared.
+CASE_VERSIONS = {
+    'get_data': 2,  # snapshots split into one file per month
+    'get_match': 2,
+    'build': 2,  # form metrics, exact means in the player cube
+    'history': 2,  # exact means in the summary
+    'app': 2,  # three-month default window, form metrics, refresh watchers
+}
+
+PLAYER_METRICS = ['kdr', 'adr', 'matou', 'headshotrate', 'killsPerMap', 'firstKillsPerMap']
+
+MATCH_STATS = ['nb_kill', 'death', 'assist', 'damage', 'adr', 'kdr', 'phs', 'pkast', 'firstkill',
+               'multikills', 'damage_share', 'kills_share', 'damage_hits']
+
+
+def timed(function, repeat):
+    times = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        times.append((time.perf_counter() - start) * 1000)
+    return result, times
+
+
+def dataset_label(data_dir):
+    # Baselines are keyed by the generator parameters, or the directory name
+    try:
+        with open(os.path.join(data_dir, 'dataset.json')) as f:
+            meta = json.load(f)
+    except OSError:
+        return os.path.normpath(data_dir), {}
+    label = f"players={meta['players']},months={meta['months']},match_rows={meta['match_rows']},seed={meta['seed']}"
+    return label, meta
+
+
+def run_cases(meta, repeat, sample):
+    # Imported here so GC_DATA_DIR is already set when the paths are resolved
+    import numpy as np
+    from src.data_read import get_data
+    from src.match_data import get_match
+    from src.data_access import PlayerData, MatchData, default_window
+    from src.downsample import downsample_lines
+
+    results = {}
+
+    def case(name, function, times=repeat):
+        value, elapsed = timed(function, times)
+        results[name] = elapsed
+        return value
+
+    # Loaders. The workbook cases parse the xlsx once; the snapshot cases read Parquet
+    if meta.get('format', 'xlsx') == 'xlsx':
+        case('get_data.workbook', lambda: get_data(use_snapshot=False), 1)
+        case('get_match.workbook', lambda: get_match(use_snapshot=False), 1)
+    # Untimed first call so the snapshots exist before they are timed
+    get_data()
+    get_match()
+    players_df = case('get_data.snapshot', get_data)
+    matches_df = case('get_match.snapshot', get_match)
+    # Only the partitions of the default month window
+    window = default_window()
+    case('get_data.window', lambda: get_data(window=window))
+    case('get_match.window', lambda: get_match(window=window))
+
+    player_data = case('build.player_data', lambda: PlayerData(players_df))
+    match_data = case('build.match_data', lambda: MatchData(matches_df))
+    cube, lookup = player_data.cube, match_data.lookup
+
+    # Player dashboard: chart and stats for every player
+    players = cube.players
+    case('player.chart', lambda: [cube.chart(metric, players) for metric in PLAYER_METRICS])
+    case('player.stats', lambda: [cube.stats(metric, players) for metric in PLAYER_METRICS])
+    case('player.downsample', lambda: downsample_lines(cube.chart('kdr', players), 'KDR'))
+
+    # Player match history for a sample of players, all of their games
+    nicks = lookup.players[::max(1, len(lookup.players) // sample)][:sample]
+    history = case('history.filter', lambda: [lookup.player_rows(nick, lookup.player_games(nick)) for nick in nicks])
+    case('history.chart', lambda: [match_data.frame(['game_id', 'adr'], rows).set_index('game_id') for rows in history])
+    case('history.summary', lambda: [match_data.summary(MATCH_STATS, rows) for rows in history])
+    case('history.page', lambda: [match_data.sorted_rows(rows, ('updated_at',), True, 0, 50) for rows in history])
+
+    # Match analysis over the latest games
+    games = lookup.games[-sample:]
+
+    def match_filter():
+        rows = lookup.game_rows(games)
+        return lookup.keep_players(rows, lookup.players_in(rows))
+
+    rows = case('analysis.filter', match_filter)
+    case('analysis.pivot', lambda: match_data.frame(['game_id', 'nick', 'adr'], rows).pivot(
+        index='game_id', columns='nick', values='adr'))
+    case('analysis.page', lambda: match_data.sorted_rows(rows, ('game_id', 'team', 'nick'), False, 0, 50))
+    case('analysis.sort_all', lambda: match_data.sorted_rows(np.arange(len(matches_df)), ('damage_share',), True, 0, 50))
+
+    return results
+
+
+def run_app(repeat):
+    # Headless dashboard sessions. The first one also loads the shared datasets
+    from streamlit.testing.v1 import AppTest
+    from src.instrument import recorder
+
+    def session():
+        at = AppTest.from_file('../main.py', default_timeout=600).run()
+        if at.exception:
+            raise RuntimeError(at.exception)
+        return at
+
+    results = {}
+    _, results['app.first_session'] = timed(session, 1)
+    recorder.reset()
+    at, results['app.session'] = timed(session, repeat)
+
+    # Cycles through the metrics, each change reruns only that fragment
+    metrics = iter(at.selectbox(key='player_history_metric').options[1:] * repeat)
+    _, results['app.history_metric_change'] = timed(
+        lambda: at.selectbox(key='player_history_metric').set_value(next(metrics)).run(), repeat)
+
+    # Per-stage times recorded by the instrumentation during those runs
+    for name, stats in recorder.snapshot()['stages'].items():
+        if not name.startswith('section.'):
+            results[f'app.stage.{name}'] = [stats['mean_ms']]
+    return results
+
+
+def case_version(name):
+    return CASE_VERSIONS.get(name.split('.')[0], 1)
+
+
+def load_baselines():
+    try:
+        with open(BASELINES) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def report(results, recorded, tolerance):
+    # Cases are only compared with a baseline of the same case version
+    baseline, versions = recorded.get('results', {}), recorded.get('versions', {})
+    regressions = []
+    print(f"{'case':40s} {'median ms':>10s} {'min ms':>10s} {'baseline':>10s} {'ratio':>7s}")
+    for name, times in results.items():
+        median = statistics.median(times)
+        line = f"{name:40s} {median:10.2f} {min(times):10.2f}"
+        if name in baseline and versions.get(name.split('.')[0], 1) != case_version(name):
+            line += "  (baseline of an older case version)"
+        elif name in baseline:
+            ratio = median / baseline[name] if baseline[name] else float('inf')
+            flag = '  REGRESSION' if ratio > 1 + tolerance and median - baseline[name] > 1 else ''
+            line += f" {baseline[name]:10.2f} {ratio:7.2f}{flag}"
+            if flag:
+                regressions.append(name)
+        print(line)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark loaders and dashboard paths")
+    parser.add_argument('--data', default='bench/data', help="directory written by bench.synthetic, or src")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--sample', type=int, default=20, help="players and games per filter case")
+    parser.add_argument('--no-app', action='store_true', help="skip the AppTest runs")
+    parser.add_argument('--save', action='store_true', help="store the medians as the new baseline")
+    parser.add_argument('--check', action='store_true', help="exit 1 on regressions")
+    parser.add_argument('--tolerance', type=float, default=0.3, help="allowed slowdown, 0.3 = 30%%")
+    args = parser.parse_args()
+
+    if not os.path.exists(os.path.join(args.data, 'teste_gc.xlsx')):
+        parser.error(f"no dataset in {args.data}, generate one with python -m bench.synthetic --output {args.data}")
+    os.environ['GC_DATA_DIR'] = args.data
+
+    label, meta = dataset_label(args.data)
+    print(f"Dataset {label}")
+    results = run_cases(meta, args.repeat, args.sample)
+    if not args.no_app:
+        results.update(run_app(args.repeat))
+
+    baselines = load_baselines()
+    regressions = report(results, baselines.get(label, {}), args.tolerance)
+
+    if args.save:
+        baselines[label] = {
+            'recorded': time.strftime('%Y-%m-%d'),
+            'machine': f'{platform.machine()} {platform.system()} python {platform.python_version()}',
+            'results': {name: round(statistics.median(times), 3) for name, times in results.items()},
+            'versions': {name.split('.')[0]: case_version(name) for name in results},
+        }
+        with open(BASELINES, 'w') as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+        print(f"Baseline saved for {label}")
+
+    if args.check and regressions:
+        print(f"{len(regressions)} regressions over {args.tolerance:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
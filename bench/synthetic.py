@@ -0,0 +1,161 @@
+import os
+import json
+import argparse
+import numpy as np
+import pandas as pd
+from src.schema import MATCH_DTYPES, PLAYER_DTYPES
+
+# Random data in the teste_gc.xlsx / match_gc.xlsx schemas, at any scale.
+# Nicks in the match table are drawn from the generated players, and games
+# have ten players split into two teams, like the real exports.
+#
+#   python -m bench.synthetic --players 10000 --match-rows 1000000 --output bench/data
+#
+# Writing and parsing large workbooks is slow (openpyxl); --format parquet
+# writes the Parquet snapshots directly instead, which is what the dashboard
+# reads once a workbook has been parsed.
+
+MAPS = ['de_ancient', 'de_anubis', 'de_dust2', 'de_inferno', 'de_mirage', 'de_nuke', 'de_train']
+
+PLAYERS_PER_GAME = 10
+
+
+def two_decimals(values):
+    return np.round(values, 2)
+
+
+def player_names(n):
+    return [f'player{i:06d}' for i in range(n)]
+
+
+def generate_players(n_players, months, rng):
+    mes = pd.period_range(end=pd.Timestamp.today(), periods=months, freq='M').to_timestamp()
+    ids = rng.choice(np.arange(100000, 100000 + n_players * 20), n_players, replace=False)
+
+    # Not every player plays every month
+    active = rng.random((n_players, months)) < 0.8
+    player, month = np.nonzero(active)
+    n = len(player)
+
+    matches = rng.integers(1, 180, n)
+    matou = rng.poisson(matches * 17)
+    morreu = np.maximum(1, rng.poisson(matches * 17))
+    df = pd.DataFrame({
+        'mes': mes[month],
+        'id': ids[player],
+        'nome': np.array(player_names(n_players), dtype=object)[player],
+        'kdr': two_decimals(matou / morreu),
+        'adr': two_decimals(rng.normal(78, 15, n).clip(20, 160)),
+        'matou': matou,
+        'morreu': morreu,
+        'multikills': rng.binomial(matou, 0.25),
+        'firstkills': rng.binomial(matou, 0.15),
+        'headshotrate': np.round(rng.normal(42, 10, n).clip(0, 100)),
+        'bomb_planted': rng.poisson(matches * 0.7),
+        'bomb_defused': rng.poisson(matches * 0.25),
+        'matches': matches,
+    })
+    return df.astype(PLAYER_DTYPES)
+
+
+def generate_matches(n_rows, players, rng):
+    n_games = max(1, n_rows // PLAYERS_PER_GAME)
+    n = n_games * PLAYERS_PER_GAME
+    game = np.repeat(np.arange(n_games), PLAYERS_PER_GAME)
+
+    # Ten distinct players per game, spread over the whole pool
+    pool = np.asarray(players, dtype=object)
+    stride = len(pool) // PLAYERS_PER_GAME
+    offsets = rng.integers(0, len(pool), n_games)
+    nick = pool[((offsets[:, None] + np.arange(PLAYERS_PER_GAME) * stride) % len(pool)).ravel()]
+
+    # Newest games first with increasing ids over time, like the API
+    game_ids = 22600000 + np.sort(rng.choice(np.arange(n_games * 20), n_games, replace=False))[::-1]
+    started = pd.Timestamp('2024-01-01') + pd.to_timedelta(np.sort(rng.integers(0, 3600 * 24 * 600, n_games))[::-1], unit='s')
+
+    nb_kill = rng.poisson(17, n)
+    death = rng.poisson(17, n)
+    hits = rng.poisson(72, n) + nb_kill
+    damage = hits * rng.integers(15, 35, n)
+    rounds = rng.integers(16, 31, n_games)[game]
+    # Rounds with 1..5 kills
+    kills = np.stack([rng.binomial(nb_kill // k, p) for k, p in enumerate([0.45, 0.35, 0.2, 0.1, 0.05], 1)], axis=1)
+
+    df = pd.DataFrame({
+        'game_id': game_ids[game],
+        'nick': nick,
+        'team': np.where(np.arange(n) % PLAYERS_PER_GAME < PLAYERS_PER_GAME // 2, 'Team A', 'Team B'),
+        'updated_at': started[game],
+        'map_name': np.array(MAPS, dtype=object)[rng.integers(0, len(MAPS), n_games)][game],
+        'player_room': np.where(np.arange(n) % PLAYERS_PER_GAME < PLAYERS_PER_GAME // 2, 'a', 'b'),
+        'nb_kill': nb_kill,
+        'assist': rng.poisson(6, n),
+        'death': death,
+        'hs': rng.binomial(nb_kill, 0.42),
+        'damage': damage,
+        'adr': two_decimals(damage / rounds),
+        'kdr': two_decimals(nb_kill / np.maximum(death, 1)),
+        'phs': np.round(rng.normal(42, 12, n).clip(0, 100)),
+        'firstkill': rng.poisson(2.4, n),
+        'pkast': np.round(rng.normal(67, 12, n).clip(0, 100)),
+        'nb1kill': kills[:, 0],
+        'nb2kill': kills[:, 1],
+        'nb3kill': kills[:, 2],
+        'nb4kill': kills[:, 3],
+        'nb5kill': kills[:, 4],
+        'defuse': rng.poisson(0.4, n),
+        'bombe': rng.poisson(1.4, n),
+        'hits': hits,
+        'level': rng.integers(1, 21, n),
+        'rating': rng.integers(500, 3500, n),
+        'flash_assist': rng.poisson(0.4, n),
+        'multikills': kills[:, 1:].sum(axis=1),
+    })
+    return df.astype(MATCH_DTYPES)
+
+
+def write(players_df, matches_df, output, fmt):
+    from src.snapshot import write_snapshot
+    os.makedirs(output, exist_ok=True)
+    player_file = os.path.join(output, 'teste_gc.xlsx')
+    match_file = os.path.join(output, 'match_gc.xlsx')
+
+    if fmt == 'xlsx':
+        players_df.to_excel(player_file, index=False)
+        matches_df.to_excel(match_file, index=False)
+    else:
+        # Placeholder workbooks, the snapshots below are fresh for them
+        pd.DataFrame(columns=list(PLAYER_DTYPES)).to_excel(player_file, index=False)
+        pd.DataFrame(columns=list(MATCH_DTYPES)).to_excel(match_file, index=False)
+        write_snapshot(players_df, player_file, 'players', 'mes')
+        write_snapshot(matches_df, match_file, 'matches', 'updated_at')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic player and match data")
+    parser.add_argument('--players', type=int, default=1000)
+    parser.add_argument('--months', type=int, default=24)
+    parser.add_argument('--match-rows', type=int, default=100000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--format', choices=['xlsx', 'parquet'], default='xlsx')
+    parser.add_argument('--output', default='bench/data')
+    args = parser.parse_args()
+    if args.players < PLAYERS_PER_GAME:
+        parser.error(f"--players must be at least {PLAYERS_PER_GAME}, one game has that many players")
+
+    # Snapshots are written under the output directory, not src/
+    os.environ['GC_DATA_DIR'] = args.output
+
+    rng = np.random.default_rng(args.seed)
+    players_df = generate_players(args.players, args.months, rng)
+    matches_df = generate_matches(args.match_rows, player_names(args.players), rng)
+    write(players_df, matches_df, args.output, args.format)
+
+    # Read by bench.suite to know what it is timing
+    with open(os.path.join(args.output, 'dataset.json'), 'w') as f:
+        json.dump({**vars(args), 'player_rows': len(players_df), 'match_rows': len(matches_df)}, f, indent=2)
+    print(f"{len(players_df)} player rows and {len(matches_df)} match rows written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,10 @@
+import argparse
+from array import array
+import numpy as np
 import pandas as pd
-import requests 
-import json 
+from loader.fetcher import BASE_URL, add_fetch_arguments, cache_from_args, fetcher_from_args
+from src.match_store import append_matches, stored_game_ids
+from src.schema import MATCH_DTYPES
 
 # List of game IDs
 game_ids = [
@@ -15,9 +19,6 @@ game_ids = [
     '22648675'
 ]
 
-# Create an empty list to store all games data
-all_games_data = []
-
 # Define the columns we want to extract
 columns = [
     'updated_at',     # Game date
@@ -46,71 +47,141 @@ columns = [
     'multikills'      # Multi-kill rounds
 ]
 
-# Loop through each game ID
-for game_id in game_ids:
-    try:
-        # Construct URL for each game
-        url = f'https://gamersclub.com.br/lobby/match/{game_id}/1'
-        request = requests.get(url)
-        request_response = request.text
-        data = json.loads(request_response)
-
-        # Extract players data from both teams
-        team_a = data['jogos']['players']['team_a']
-        team_b = data['jogos']['players']['team_b']
-
-        # Get the match date and map name from jogos
-        match_date = data['jogos']['updated_at']
-        map_name = data['jogos']['map_name']
-
-        # Combine both teams' data
-        all_players = team_a + team_b
-
-        # Extract data for each player
-        for player in all_players:
-            player_dict = {
-                'game_id': game_id,  # Add game ID to track which game
-                'nick': player['player']['nick'],
-                'team': 'Team A' if player['player_room'] == 'a' else 'Team B',
-                'updated_at': match_date,
-                'map_name': map_name
-            }
-            
-            # Add stats from the columns list
-            for col in columns:
-                if col != 'updated_at':  # Skip updated_at as we already added it
-                    player_dict[col] = player[col]
-            
-            all_games_data.append(player_dict)
-        
-        print(f"Successfully processed game {game_id}")
-        
-    except Exception as e:
-        print(f"Error processing game {game_id}: {str(e)}")
-        continue
-
-# Create DataFrame from all games
-df = pd.DataFrame(all_games_data)
-
-# Convert numeric columns
-numeric_columns = [
-    'nb_kill', 'assist', 'death', 'hs', 'damage', 'firstkill',
-    'nb1kill', 'nb2kill', 'nb3kill', 'nb4kill', 'nb5kill',
-    'defuse', 'bombe', 'hits', 'level', 'rating', 
-    'flash_assist', 'multikills'
-]
-df[numeric_columns] = df[numeric_columns].astype(int)
 
-# Convert percentage columns
-percentage_columns = ['adr', 'kdr', 'phs', 'pkast']
-df[percentage_columns] = df[percentage_columns].astype(float)
+def match_url(game_id, base_url=BASE_URL):
+    return f'{base_url}/lobby/match/{game_id}/1'
+
+
+def cached_game_ids(cache):
+    # Game ids of every match response in the cache, e.g. '/lobby/match/22697838/1'
+    return [key.split('/')[3] for key in cache.requests('/lobby/match/')]
+
+
+# Games fetched and parsed before they are handed over as one batch
+BATCH_SIZE = 1000
+
+# Parses an API value into the buffer type of each MATCH_DTYPES dtype
+CONVERTERS = {'int': int, 'float': float, 'string': lambda value: value}
+
+
+def new_buffer(dtype):
+    # int64 for integers and timestamps (ns), float64 for floats, a list for strings
+    if dtype == 'float':
+        return array('d')
+    if dtype in ('int', 'datetime64[ns]'):
+        return array('q')
+    return []
+
+
+class MatchColumns:
+    # One typed buffer per MATCH_DTYPES column. Games are appended column by
+    # column, so no dict or object is kept per player, and to_frame() wraps
+    # the buffers in a DataFrame already in the store dtypes.
+
+    def __init__(self):
+        self.buffers = {column: new_buffer(dtype) for column, dtype in MATCH_DTYPES.items()}
+        self.games = 0
+        self.rows = 0
+
+    def add(self, game):
+        # Every column of the game is parsed before any buffer grows, so a
+        # game that fails to parse leaves the buffers aligned
+        for column, values in game.items():
+            self.buffers[column].extend(values)
+        self.games += 1
+        self.rows += len(game['game_id'])
+
+    def to_frame(self):
+        data = {}
+        for column, dtype in MATCH_DTYPES.items():
+            buffer = self.buffers[column]
+            if dtype == 'string':
+                data[column] = pd.array(buffer, dtype='string')
+            elif not buffer:
+                data[column] = pd.Series(dtype=dtype)
+            elif dtype == 'datetime64[ns]':
+                data[column] = np.frombuffer(buffer, dtype='int64').view('datetime64[ns]')
+            else:
+                data[column] = np.frombuffer(buffer, dtype='float64' if dtype == 'float' else 'int64')
+        return pd.DataFrame(data)
+
+
+def parse_match(game_id, data):
+    # Column -> values of both teams' players, typed for MatchColumns
+    jogos = data['jogos']
+    players = jogos['players']['team_a'] + jogos['players']['team_b']
+    n = len(players)
+
+    game = {
+        'game_id': [int(game_id)] * n,
+        'nick': [player['player']['nick'] for player in players],
+        'team': ['Team A' if player['player_room'] == 'a' else 'Team B' for player in players],
+        'updated_at': [pd.Timestamp(jogos['updated_at']).value] * n,
+        'map_name': [jogos['map_name']] * n,
+    }
+
+    # Stats from the columns list, converted once while they are read
+    for col in columns:
+        if col != 'updated_at':  # Same date for every player, set above
+            convert = CONVERTERS[MATCH_DTYPES[col]]
+            game[col] = [convert(player[col]) for player in players]
+
+    return game
+
+
+def crawl(game_ids, fetcher, base_url=BASE_URL, batch_size=BATCH_SIZE, on_batch=None):
+    # Games are fetched batch_size at a time and each response is parsed
+    # straight into the column buffers, in game_ids order. With on_batch every
+    # batch is handed over as a DataFrame (e.g. written to the store) and
+    # memory stays flat; without it all games are returned as one DataFrame.
+    buffers = MatchColumns()
+
+    for start in range(0, len(game_ids), batch_size):
+        batch = game_ids[start:start + batch_size]
+        responses = fetcher.fetch_all([match_url(game_id, base_url) for game_id in batch], progress=False)
+
+        for game_id, data in zip(batch, responses):
+            if data is None:
+                continue
+            try:
+                buffers.add(parse_match(game_id, data))
+                print(f"Successfully processed game {game_id}")
+            except Exception as e:
+                print(f"Error processing game {game_id}: {str(e)}")
+                continue
+        # Dropped before the next batch is fetched
+        responses = None
+
+        if on_batch is not None and buffers.rows:
+            on_batch(buffers.to_frame())
+            buffers = MatchColumns()
+
+    if on_batch is None:
+        return buffers.to_frame()
+
+
+def store_batch(df):
+    # Only games that are not stored yet are added to the match store, one partition per month
+    paths = append_matches(df)
+    print(f"Wrote {len(df)} rows to {', '.join(paths)}" if paths else "Nothing new to store")
+
 
-# Convert date column
-df['updated_at'] = pd.to_datetime(df['updated_at'])
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Per-player match stats from GamersClub')
+    parser.add_argument('game_ids', nargs='*', help='games to ingest (defaults to the built-in list, or every cached game with --replay)')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='games parsed and stored per partition')
+    add_fetch_arguments(parser)
+    args = parser.parse_args()
 
-# Display the DataFrame
-print(df)
+    if not args.game_ids:
+        args.game_ids = cached_game_ids(cache_from_args(args)) if args.replay else game_ids
 
-# Save to Excel with all games
-df.to_excel('match_gc.xlsx')
+    # Games already in the store are not fetched again
+    stored = stored_game_ids()
+    new_game_ids = [game_id for game_id in dict.fromkeys(args.game_ids) if int(game_id) not in stored]
+    print(f"{len(args.game_ids) - len(new_game_ids)} games already stored, {len(new_game_ids)} to fetch")
 
+    if new_game_ids:
+        # Each batch is written as it is parsed, the run never holds more than one
+        with fetcher_from_args(args) as fetcher:
+            crawl(new_game_ids, fetcher, args.base_url, args.batch_size, on_batch=store_batch)
@@ -1,103 +1,52 @@
-import pandas as pd  
-import requests
+import os
 import json
+import argparse
+import numpy as np
+import pandas as pd  
 import openpyxl
-from time import sleep
-
-
-
-def api(player, mes):
-
-    url = 'https://gamersclub.com.br/api/box/historyFilterDate/'f'{player}/{mes}'
-    request = requests.get(url)
-    request_response = request.text
-    data = json.loads(request_response)
-    
-    return data
-
-def partidas(data):
-
-    data_matches = data['matches']
-    data_matches_wins = data_matches['wins']
-    data_matches_loss = data_matches['loss']
-    data_matches_total_matches = data_matches['matches']
-
-    return data_matches, data_matches_wins, data_matches_loss, data_matches_total_matches
-
-def kdr(data):
-
-    data_stats = data['stat']
-    data_stats_kdr = data_stats[0]
-    data_kdr = data_stats_kdr['value']
-
-    return data_kdr
-
-def adr(data):
-
-    data_stats = data['stat']
-    data_stats_adr = data_stats[1]
-    data_adr = data_stats_adr['value']
-
-    return data_adr 
+from loader.fetcher import BASE_URL, add_fetch_arguments, fetcher_from_args
 
-def matou(data):
 
-    data_stats = data['stat']
-    data_stats_matou = data_stats[2]
-    data_matou = data_stats_matou['value']
 
-    return data_matou
+def history_url(player, mes, base_url=BASE_URL):
 
-def morreu(data):
+    return f'{base_url}/api/box/historyFilterDate/{player}/{mes}'
 
-    data_stats = data['stat']
-    data_stats_morreu = data_stats[3]
-    data_morreu = data_stats_morreu['value']
+def numero(valor):
 
-    return data_morreu
+    # Stats come as numbers or strings such as '56%'; missing values count as 0
+    if valor is None or valor == '':
+        return 0
+    if isinstance(valor, str):
+        valor = valor.replace('%', '').replace(',', '.').strip()
+    return float(valor)
 
-def multi_kills(data):
 
-    data_stats = data['stat']
-    data_stats_multikills = data_stats[5]
-    data_multikills = data_stats_multikills['value']
+def rotulo(texto):
 
-    return data_multikills
+    return ''.join(c for c in str(texto).lower() if c.isalnum())
 
-def first_kills(data):
 
-    data_stats = data['stat']
-    data_stats_firstkills = data_stats[6]
-    data_firstkills = data_stats_firstkills['value']
+# data['stat'] entries -> output columns. Entries are matched by label (any of
+# the aliases); the position is only used when a response has no labels, and
+# a labelled response missing one of them is reported instead of read by position.
+estatisticas = [
+    # (column, dtype, position, labels)
+    ('kdr', 'float64', 0, ['KDR']),
+    ('adr', 'float64', 1, ['ADR']),
+    ('matou', 'int64', 2, ['Kills', 'Matou', 'Abates']),
+    ('morreu', 'int64', 3, ['Deaths', 'Morreu', 'Mortes']),
+    ('multikills', 'int64', 5, ['Multi-kills', 'Multi Kills', 'Multikills']),
+    ('firstkills', 'int64', 6, ['First kills', 'First Kill', 'Firstkills']),
+    ('headshotrate', 'float64', 7, ['% Headshots', 'Headshots', 'Headshot Rate', 'HS']),
+    ('bomb_planted', 'int64', 8, ['Bombas plantadas', 'Bombs Planted', 'Bomb Planted']),
+    ('bomb_defused', 'int64', 9, ['Bombas desarmadas', 'Bombs Defused', 'Bomb Defused']),
+]
 
-    return data_firstkills
+rotulos = {rotulo(alias): coluna for coluna, _, _, aliases in estatisticas for alias in aliases}
 
-def headshot_rate(data):
-
-    data_stats = data['stat']
-    data_stats_headshots = data_stats[7]
-    data_hs = data_stats_headshots['value']
-
-    return data_hs
-
-def bombas_plantadas(data):
-
-    data_stats = data['stat']
-    data_stats_bombplanted = data_stats[8]
-    data_bombplanted = data_stats_bombplanted['value']
-
-    return data_bombplanted
-
-def bombas_defusadas(data):
-
-    data_stats = data['stat']
-    data_stats_bombdefuse = data_stats[9]
-    data_bombdefused = data_stats_bombdefuse['value']
-
-    return data_bombdefused
-
-
-meses =  ['2024-01', '2024-02', '2024-03', '2024-04', '2024-05', '2024-06', '2024-07', '2024-08', '2024-09', '2024-10', '2024-11','2024-12','2025-01', '2025-02', '2025-03']
+# Every month from the start of the history up to the current (still open) one
+meses = pd.period_range('2024-01', pd.Timestamp.today(), freq='M').strftime('%Y-%m').tolist()
 
 players = {'players':[
 
@@ -109,102 +58,174 @@ players = {'players':[
 
 ]}
 
-mes_lista = [] 
-id_lista = []
-nome_lista = []
-kdr_lista = []
-adr_lista = []
-matou_lista = []
-morreu_lista = []
-multikills_lista = []
-firstkills_lista = []
-headshot_list = []
-bombplanted_list = []
-bombdefused_lista = []
-matches_lista = []
+tipos = {'mes': 'datetime64[ns]', 'id': 'int64', 'nome': 'object'}
+tipos.update({coluna: tipo for coluna, tipo, _, _ in estatisticas})
+tipos['matches'] = 'int64'
+
+colunas = list(tipos)
+
+
+def extrair_linha(mes, player, data):
+
+    # One pass over data['stat']: label -> value, parsed to numbers right away
+    stats = data['stat']
+    valores = {}
+    if any('stat' in item for item in stats):
+        for item in stats:
+            coluna = rotulos.get(rotulo(item.get('stat', '')))
+            if coluna is not None:
+                valores[coluna] = numero(item.get('value'))
+        for coluna, _, _, _ in estatisticas:
+            if coluna not in valores:
+                print(f"Estatistica {coluna} ausente para {player['name']} em {mes}")
+    else:
+        for coluna, _, posicao, _ in estatisticas:
+            if posicao < len(stats):
+                valores[coluna] = numero(stats[posicao].get('value'))
+
+    # Values in the order of `colunas`
+    linha = [mes, int(player['ID']), player['name']]
+    linha += [valores.get(coluna, 0) for coluna, _, _, _ in estatisticas]
+    linha.append(numero(data['matches']['matches']))
+    return linha
 
-contador = []
 
-for mes in meses:
-    for player in players['players']:
+def montar_df(linhas):
 
-        contador_mes = len(meses)
-        contador_player = len(players['players'])
-        total = contador_mes * contador_player
+    # Each column is allocated once with its final dtype and filled in place
+    buffers = {coluna: np.empty(len(linhas), dtype=tipo) for coluna, tipo in tipos.items()}
+    for i, linha in enumerate(linhas):
+        for coluna, valor in zip(colunas, linha):
+            buffers[coluna][i] = valor
 
-        contador.append(1)
+    df = pd.DataFrame(buffers, copy=False)
+    df['nome'] = df['nome'].astype('string')
 
-        print("Carregando" f' {len(contador)} do total de {total}')
+    return df
 
 
-        name_player = player['name']
+def metricas_por_mapa(df):
 
-        id_player = int(player['ID'])
+    df["killsPerMap"] = df["matou"]/df["matches"].round(2)
+    df["deatchsPerMap"] = df["morreu"]/df["matches"].round(2)
+    df["firstKillsPerMap"] = df["firstkills"]/df["matches"].round(2)
+    df["bombPlantedPerMap"] = df["bomb_planted"]/df["matches"].round(2)
+    df["bombDefusedPerMap"] = df["bomb_defused"]/df["matches"].round(2)
 
-        data = api(id_player, mes)
+    return df
 
 
-        nome_lista.append(name_player)
+def ler_checkpoint(caminho):
 
+    # Rows already fetched by a run that did not finish, keyed by (id, mes)
+    linhas = {}
+    if not os.path.exists(caminho):
+        return linhas
+    with open(caminho) as f:
+        for linha in f:
+            try:
+                registro = json.loads(linha)
+            except ValueError:
+                # The last line may be cut short if the process died mid-write
+                continue
+            linhas[(registro[1], registro[0])] = registro
+    return linhas
 
-        id_lista.append(id_player)
 
-        mes_lista.append(mes)
+def pares_pendentes(existente, estado):
 
+    todos = [(mes, player) for mes in meses for player in players['players']]
+    if existente is None:
+        return todos
 
-        kdr_response = kdr(data)
-        kdr_lista.append(kdr_response)
+    # Closed months never change, so only missing pairs and months that were
+    # still open at the last run (plus the current one) are fetched again
+    guardados = set(zip(existente['id'], existente['mes'].dt.strftime('%Y-%m')))
+    aberto = estado.get('mes_aberto') or existente['mes'].max().strftime('%Y-%m')
+    return [
+        (mes, player) for mes, player in todos
+        if mes >= aberto or (int(player['ID']), mes) not in guardados
+    ]
 
 
-        adr_response = adr(data)
-        adr_lista.append(adr_response)
+def crawl(fetcher, pares, base_url=BASE_URL, checkpoint=None):
 
+    # Pairs saved by an interrupted run are not fetched again
+    salvos = ler_checkpoint(checkpoint) if checkpoint else {}
+    pares = [(mes, player) for mes, player in pares if (int(player['ID']), mes) not in salvos]
+    urls = [history_url(int(player['ID']), mes, base_url) for mes, player in pares]
+    print(f"{len(salvos)} registros no checkpoint, {len(urls)} para buscar")
 
-        matou_response = matou(data)
-        matou_lista.append(matou_response)
+    novas = []
+    arquivo = open(checkpoint, 'a') if checkpoint else None
 
-        morreu_response = morreu(data)
-        morreu_lista.append(morreu_response)
+    def salvar(i, data):
+        mes, player = pares[i]
+        linha = extrair_linha(mes, player, data)
+        novas.append(linha)
+        if arquivo is not None:
+            arquivo.write(json.dumps(linha) + '\n')
+            arquivo.flush()
 
-        multi_kills_response = multi_kills(data)
-        multikills_lista.append(multi_kills_response)
+    try:
+        respostas = fetcher.fetch_all(urls, on_result=salvar)
+    finally:
+        if arquivo is not None:
+            arquivo.close()
 
+    for (mes, player), data in zip(pares, respostas):
+        if data is None:
+            print(f"Sem dados para {player['name']} em {mes}")
 
-        firstkills_response = first_kills(data)
-        firstkills_lista.append(firstkills_response)
+    return list(salvos.values()) + novas
 
-        headshot_response = headshot_rate(data)
-        headshot_list.append(headshot_response)
 
-        bombas_plantadas_response = bombas_plantadas(data)
-        bombplanted_list.append(bombas_plantadas_response)
+def mesclar(saida, existente, novas):
 
+    df = montar_df(novas)
+    if existente is not None:
+        df = pd.concat([existente[colunas], df], ignore_index=True)
 
-        bombas_defusadas_response = bombas_defusadas(data)
-        bombdefused_lista.append(bombas_defusadas_response)
+    # A refetched pair replaces the stored one
+    df = df.drop_duplicates(subset=['id', 'mes'], keep='last')
+    df = df.sort_values(['mes', 'id'], ignore_index=True)
+    df = metricas_por_mapa(df)
 
-        
-        matches_response = partidas(data)[3]
-        matches_lista.append(matches_response)
+    # Write next to the target and swap it in, so a crash never leaves a half-written store
+    temporario = saida.replace('.xlsx', '.tmp.xlsx')
+    df.to_excel(temporario, index=False)
+    os.replace(temporario, saida)
 
+    return df
 
-lista_de_tuplas = list(zip(mes_lista, id_lista, nome_lista, kdr_lista, adr_lista , matou_lista, morreu_lista, multikills_lista, firstkills_lista, headshot_list, bombplanted_list, bombdefused_lista, matches_lista))
-df = pd.DataFrame(lista_de_tuplas, columns=['mes', 'id', 'nome', 'kdr', 'adr', 'matou', 'morreu', 'multikills', 'firstkills', 'headshotrate', 'bomb_planted', 'bomb_defused', 'matches']) 
-df['headshotrate'] = df['headshotrate'].str.replace('%', '').astype(float)
-df['bomb_planted'] = df['bomb_planted'].str.replace('%', '').astype(int)
-df['bomb_defused'] = df['bomb_defused'].str.replace('%', '').astype(int)
-df.fillna(0, inplace=True)
 
-df = df.astype({'mes':'datetime64[ns]', 'id':'int', 'nome':'string', 'kdr':'float64', 'adr': 'float64', 'matou' :'int', 'morreu' : 'int', 'multikills': 'int', 'firstkills' : 'int', 'headshotrate' : 'float', 'bomb_planted':'int', 'bomb_defused':'int', 'matches':'int'})
+if __name__ == "__main__":
 
-df["killsPerMap"] = df["matou"]/df["matches"].round(2)
-df["deatchsPerMap"] = df["morreu"]/df["matches"].round(2)
-df["firstKillsPerMap"] = df["firstkills"]/df["matches"].round(2)
-df["bombPlantedPerMap"] = df["bomb_planted"]/df["matches"].round(2)
-df["bombDefusedPerMap"] = df["bomb_defused"]/df["matches"].round(2)
+    parser = argparse.ArgumentParser(description='Monthly player stats from GamersClub')
+    add_fetch_arguments(parser)
+    parser.add_argument('--output', default='teste_gc.xlsx', help='workbook to write')
+    parser.add_argument('--incremental', action='store_true', help='only fetch pairs missing from --output plus open months')
+    args = parser.parse_args()
 
+    checkpoint = args.output.replace('.xlsx', '.checkpoint.jsonl')
+    caminho_estado = args.output.replace('.xlsx', '.state.json')
 
+    existente = None
+    estado = {}
+    if args.incremental and os.path.exists(args.output):
+        existente = pd.read_excel(args.output)
+        if os.path.exists(caminho_estado):
+            with open(caminho_estado) as f:
+                estado = json.load(f)
+
+    pares = pares_pendentes(existente, estado)
 
-df.to_excel('teste_gc.xlsx', index=False)
+    with fetcher_from_args(args) as fetcher:
+        linhas = crawl(fetcher, pares, args.base_url, checkpoint)
 
+    mesclar(args.output, existente, linhas)
 
+    # The store is safely on disk, so the checkpoint is no longer needed
+    with open(caminho_estado, 'w') as f:
+        json.dump({'mes_aberto': meses[-1]}, f)
+    os.remove(checkpoint)
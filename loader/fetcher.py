@@ -0,0 +1,135 @@
+import time
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from loader.response_cache import CACHE_DIR, ResponseCache
+
+BASE_URL = 'https://gamersclub.com.br'
+
+
+class RateLimiter:
+    # Hands out evenly spaced start times, shared by all worker threads
+
+    def __init__(self, rate=None):
+        self.interval = 1.0 / rate if rate else 0.0
+        self._lock = threading.Lock()
+        self._next = 0.0
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.interval
+        delay = slot - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+
+class Fetcher:
+    # Bounded thread pool over one pooled session: connections are reused,
+    # at most `concurrency` requests are in flight and at most `rate_limit`
+    # requests start per second. Transient failures (connection errors,
+    # 429 and 5xx) are retried with exponential backoff.
+    # With a cache every raw body is recorded; offline=True serves requests
+    # from the cache only and never touches the network.
+
+    def __init__(self, concurrency=8, rate_limit=None, timeout=15, retries=3, backoff=0.5, cache=None, offline=False):
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.cache = cache
+        self.offline = offline
+        self.limiter = RateLimiter(rate_limit)
+
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=('GET',),
+            respect_retry_after_header=True,
+        )
+        adapter = HTTPAdapter(pool_connections=concurrency, pool_maxsize=concurrency, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def get_json(self, url):
+        if self.offline:
+            content = self.cache.get(url) if self.cache is not None else None
+            if content is None:
+                raise LookupError(f'{url} is not in the response cache')
+            return json.loads(content)
+
+        self.limiter.wait()
+        response = self.session.get(url, timeout=self.timeout)
+        response.raise_for_status()
+        if self.cache is not None:
+            self.cache.put(url, response.content)
+        return json.loads(response.content)
+
+    def fetch_all(self, urls, progress=True, on_result=None):
+        # Results come back in the same order as `urls`; failed requests are None.
+        # on_result(i, data) runs on the calling thread as each request succeeds.
+        results = [None] * len(urls)
+        total = len(urls)
+        done = 0
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            futures = {pool.submit(self.get_json, url): i for i, url in enumerate(urls)}
+            for future in as_completed(futures):
+                i = futures[future]
+                done += 1
+                try:
+                    results[i] = future.result()
+                except Exception as e:
+                    print(f"Error fetching {urls[i]}: {str(e)}")
+                    continue
+                if on_result is not None:
+                    on_result(i, results[i])
+                if progress:
+                    print(f"Carregando {done} do total de {total}")
+
+        return results
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def add_fetch_arguments(parser):
+    parser.add_argument('--concurrency', type=int, default=8, help='maximum requests in flight')
+    parser.add_argument('--rate-limit', type=float, default=None, help='maximum requests started per second')
+    parser.add_argument('--timeout', type=float, default=15, help='per-request timeout in seconds')
+    parser.add_argument('--retries', type=int, default=3, help='retries for transient failures')
+    parser.add_argument('--base-url', default=BASE_URL, help='API host, e.g. a local stub server')
+    parser.add_argument('--cache-dir', default=CACHE_DIR, help='where raw responses are kept')
+    parser.add_argument('--no-cache', action='store_true', help='do not record raw responses')
+    parser.add_argument('--no-compress', action='store_true', help='store raw responses uncompressed')
+    parser.add_argument('--replay', action='store_true', help='rebuild from cached responses only, no network')
+
+
+def cache_from_args(args):
+    if args.no_cache and not args.replay:
+        return None
+    return ResponseCache(args.cache_dir, compress=not args.no_compress)
+
+
+def fetcher_from_args(args):
+    return Fetcher(
+        concurrency=args.concurrency,
+        rate_limit=args.rate_limit,
+        timeout=args.timeout,
+        retries=args.retries,
+        cache=cache_from_args(args),
+        offline=args.replay,
+    )
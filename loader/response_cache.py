@@ -0,0 +1,93 @@
+import os
+import json
+import gzip
+import time
+import hashlib
+import tempfile
+from urllib.parse import urlsplit, parse_qsl, urlencode
+
+# Raw API responses, so new columns can be extracted later without crawling
+# again. Bodies are stored once under their own sha256 (objects/), and each
+# request (endpoint + sorted query params, host excluded) points at the body
+# it last returned (refs/).
+CACHE_DIR = 'loader/.cache'
+
+
+def request_key(url):
+    parts = urlsplit(url)
+    query = urlencode(sorted(parse_qsl(parts.query)))
+    return parts.path + ('?' + query if query else '')
+
+
+def write_atomic(path, data):
+    # A temp file of its own per call: fetcher threads may write the same path
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=os.path.basename(path) + '.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+
+
+class ResponseCache:
+
+    def __init__(self, directory=CACHE_DIR, compress=True):
+        self.directory = directory
+        self.compress = compress
+        self.refs_dir = os.path.join(directory, 'refs')
+        self.objects_dir = os.path.join(directory, 'objects')
+        os.makedirs(self.refs_dir, exist_ok=True)
+        os.makedirs(self.objects_dir, exist_ok=True)
+
+    def ref_path(self, key):
+        return os.path.join(self.refs_dir, hashlib.sha256(key.encode()).hexdigest() + '.json')
+
+    def blob_path(self, digest, compressed):
+        return os.path.join(self.objects_dir, digest[:2], digest + ('.gz' if compressed else ''))
+
+    def put(self, url, content):
+        key = request_key(url)
+        digest = hashlib.sha256(content).hexdigest()
+
+        # Identical bodies (e.g. empty months) share one object
+        path = self.blob_path(digest, self.compress)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            try:
+                write_atomic(path, gzip.compress(content) if self.compress else content)
+            except OSError:
+                # Another thread stored the same body first; blobs are
+                # content-addressed, so its copy is as good as this one
+                if not os.path.exists(path):
+                    raise
+
+        ref = {'request': key, 'blob': digest, 'compressed': self.compress, 'fetched_at': time.time()}
+        write_atomic(self.ref_path(key), json.dumps(ref).encode())
+
+    def get(self, url):
+        try:
+            with open(self.ref_path(request_key(url))) as f:
+                ref = json.load(f)
+            with open(self.blob_path(ref['blob'], ref['compressed']), 'rb') as f:
+                content = f.read()
+        except (OSError, ValueError):
+            return None
+        return gzip.decompress(content) if ref['compressed'] else content
+
+    def requests(self, prefix=''):
+        # Every cached request whose endpoint starts with prefix
+        keys = []
+        for name in os.listdir(self.refs_dir):
+            try:
+                with open(os.path.join(self.refs_dir, name)) as f:
+                    key = json.load(f)['request']
+            except (OSError, ValueError):
+                continue
+            if key.startswith(prefix):
+                keys.append(key)
+        return sorted(keys)
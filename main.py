@@ -1,37 +1,75 @@
 import streamlit as st
 import pandas as pd
-from src.data_read import get_data
+from src.data_access import DEFAULT_MONTHS, available_months, get_player_dataset, get_match_dataset, refresh_datasets, dataset_versions
+from src.partitions import last_months
+from src.table import paginated_table
+from src.downsample import line_chart, bar_chart
+from src.instrument import stage
+from src.debug_panel import debug_enabled, debug_panel, traced
+
+# Sessions share one read-only copy of the data; with copy-on-write, filtered
+# views reference it instead of copying it
+pd.set_option('mode.copy_on_write', True)
+
+
+def month_window():
+    # Months the dashboard shows, the most recent ones by default. Only the
+    # partitions of these months are loaded and aggregated
+    months = available_months()
+    if len(months) < 2:
+        return last_months(months, DEFAULT_MONTHS)
+    return st.select_slider(
+        "Months to analyze",
+        options=months,
+        value=last_months(months, DEFAULT_MONTHS),
+        key="month_window"
+    )
 
 
-# Add caching to prevent reloading data on every interaction
-@st.cache_data(ttl=3600)  # Cache for 1 hour
-def load_data():
+# The dataset is parsed once per process and shared by every session
+@traced('load')
+def load_data(window):
     try:
-        df = get_data()  # Now reading from Excel file
-        if df is None or df.empty:
+        player_data = get_player_dataset(window)
+        if player_data is None:
             st.error("Could not load data from Excel file")
             return None
-        return df
+        if not player_data.cube.players:
+            st.warning("No player data in the selected months")
+            return None
+        return player_data
     except Exception as e:
         st.error(f"Error loading data: {str(e)}")
         return None
 
-# Initialize session state for data if not exists
-if 'data' not in st.session_state:
-    st.session_state.data = None
 
-# Add a refresh button
-if st.button('Refresh Data'):
-    st.session_state.data = None
+def show_data_version(window):
+    # Load time of the data this run uses, and whether a newer one is on its way
+    parts = []
+    refreshing = False
+    for name, (loaded_at, busy) in dataset_versions(window).items():
+        if loaded_at is not None:
+            parts.append(f"{name} {loaded_at:%Y-%m-%d %H:%M:%S}")
+        refreshing = refreshing or busy
+    if parts:
+        note = " (refreshing in the background)" if refreshing else ""
+        st.caption("Data version: " + ", ".join(parts) + note)
 
-# Load data if not in session state
-if st.session_state.data is None:
-    st.session_state.data = load_data()
 
-# Only show the dashboard if we have data
-if st.session_state.data is not None:
-    df = st.session_state.data
-    
+def format_match_page(display_df):
+    # Format datetime column
+    display_df['Date'] = display_df['Date'].dt.strftime('%Y-%m-%d %H:%M')
+
+    # Round floating point numbers
+    float_columns = ['ADR', 'KDR', 'HS%', 'KAST', 'Damage Share %', 'Kills Share %']
+    display_df[float_columns] = display_df[float_columns].astype('float64').round(2)
+    return display_df
+
+
+# Each section is a fragment: its widgets only rerun that section
+@st.fragment
+@traced('player_dashboard')
+def player_dashboard(player_data):
     st.title("Dashboard Player Analysis - CS2")
 
     # Define metrics that can be plotted
@@ -53,51 +91,50 @@ if st.session_state.data is not None:
         'Bombs Defused Per Map': 'bombDefusedPerMap'
     }
 
+    # Monthly means and per-player stats for every metric, built once per data version
+    player_cube = player_data.cube
+
     # Let user select the metric to analyze with friendly names
     selected_metric_name = st.selectbox("Select metric to analyze", list(metrics.keys()))
     selected_metric = metrics[selected_metric_name]
 
     # Add multi-select for players
-    all_players = sorted(df['nome'].unique())
+    all_players = player_cube.players
     selected_players = st.multiselect(
         "Select players to analyze",
         options=all_players,
         default=all_players  # Initially select all players
     )
 
-    # Filter the dataframe for selected players
-    df_filtered = df[df['nome'].isin(selected_players)]
-
-    # Group the data by month and player, calculating the mean of the selected metric
-    grouped_df = df_filtered.groupby(['mes', 'nome'])[selected_metric].mean().reset_index()
-
-    # Pivot the data to create a format suitable for plotting
-    pivot_df = grouped_df.pivot(index='mes', columns='nome', values=selected_metric)
+    # Slice the precomputed month x player means for the selected metric and players
+    with stage('aggregate.player_chart'):
+        pivot_df = player_cube.chart(selected_metric, selected_players)
 
     # Create the plot using Streamlit's native line chart
     st.subheader(f"{selected_metric_name} by Player Over Time")
-    st.line_chart(pivot_df)
+    # Reduced to the chart point budget for long histories
+    with stage('render.line_chart'):
+        line_chart(pivot_df, selected_metric_name)
 
     # Show summary statistics for selected players only
     st.subheader("Resumo estatístico")
-    summary_df = df_filtered.groupby('nome')[selected_metric].agg(['mean', 'min', 'max']).round(2)
-    summary_df.columns = ['Average', 'Minimum', 'Maximum']
-    st.write(summary_df)
-#### NEW PART
-# Add a divider between sections
+    with stage('aggregate.player_stats'):
+        summary_df = player_cube.stats(selected_metric, selected_players)
+    with stage('render.player_stats'):
+        st.write(summary_df)
 
-    st.markdown("---")
-    
+
+@st.fragment
+@traced('player_match_history')
+def player_match_history(window):
     st.title("Player Match History")
 
-    # Load match data if not already loaded
-    if 'match_df' not in st.session_state:
-        from src.match_data import get_match
-        st.session_state.match_df = get_match()
+    # Match data is parsed once per process and shared by all sessions
+    match_data = get_match_dataset(window)
 
-    match_df = st.session_state.match_df
+    if match_data is not None:
+        match_index = match_data.lookup
 
-    if match_df is not None:
         # Define metrics for match analysis (same as before)
         match_metrics = {
             'Kills': 'nb_kill',
@@ -117,24 +154,26 @@ if st.session_state.data is not None:
             'Damage Share %': 'damage_share',
             'Kills Share %': 'kills_share',
             'Hits Share %': 'hits_share',
-            'Damage Per Hit %': 'damage_hits'
-
-
+            'Damage Per Hit %': 'damage_hits',
+            # Form over the player's matches in date order, see src/form.py
+            'ADR (last 10 avg)': 'adr_last10',
+            'KDR (last 10 avg)': 'kdr_last10',
+            'Rating (last 10 avg)': 'rating_last10',
+            'ADR (EWMA)': 'adr_ewma',
+            'KDR (EWMA)': 'kdr_ewma',
+            'Rating (EWMA)': 'rating_ewma'
         }
 
         # First, select player
-        all_players = sorted(match_df['nick'].unique())
+        all_players = match_index.players
         selected_player = st.selectbox(
             "Select player to analyze",
             options=all_players,
             key="player_history_select"
         )
 
-        # Filter matches for selected player
-        player_matches = match_df[match_df['nick'] == selected_player]
-        
         # Then, select matches for that player
-        player_game_ids = sorted(player_matches['game_id'].unique())
+        player_game_ids = match_index.player_games(selected_player)
         selected_games = st.multiselect(
             "Select matches to analyze",
             options=player_game_ids,
@@ -150,18 +189,18 @@ if st.session_state.data is not None:
         )
         selected_metric = match_metrics[selected_metric_name]
 
-        # Filter final dataset
-        final_df = match_df[
-            (match_df['game_id'].isin(selected_games)) & 
-            (match_df['nick'] == selected_player)
-        ]
+        # Rows of the selected player in the selected games
+        with stage('filter.player_rows'):
+            final_rows = match_index.player_rows(selected_player, selected_games)
 
         # Create visualization
         st.subheader(f"{selected_metric_name} by Match")
         
         # Create and plot the chart
-        chart_df = final_df[['game_id', selected_metric]].set_index('game_id')
-        st.bar_chart(chart_df)
+        with stage('aggregate.history_chart'):
+            chart_df = match_data.frame(['game_id', selected_metric], final_rows).set_index('game_id')
+        with stage('render.bar_chart'):
+            bar_chart(chart_df)
 
         # Show detailed statistics
         st.subheader("Match Details")
@@ -200,22 +239,15 @@ if st.session_state.data is not None:
 
         }
 
-        # Create display dataframe
-        display_df = final_df[display_columns.keys()].copy()
-        display_df.columns = display_columns.values()
-        
-        # Format datetime column
-        display_df['Date'] = display_df['Date'].dt.strftime('%Y-%m-%d %H:%M')
-        
-        # Round floating point numbers
-        float_columns = ['ADR', 'KDR', 'HS%', 'KAST', 'Damage Share %', 'Kills Share %']
-        display_df[float_columns] = display_df[float_columns].round(2)
-
-        # Display the table
-        st.dataframe(
-            display_df.sort_values('Date', ascending=False),
-            hide_index=True,
-            use_container_width=True
+        # Sorted and paged on the server, newest matches first
+        paginated_table(
+            match_data,
+            final_rows,
+            display_columns,
+            format_match_page,
+            default_sort=['updated_at'],
+            descending=True,
+            key="player_history_table"
         )
                 # Add Statistics Summary section
         st.subheader("Statistics Summary for Selected Matches")
@@ -238,28 +270,28 @@ if st.session_state.data is not None:
         }
         
         # Calculate statistics
-        summary_stats = {}
-        for stat_key, stat_name in stats_to_analyze.items():
-            summary_stats[stat_name] = {
-                'Average': final_df[stat_key].mean(),
-                'Minimum': final_df[stat_key].min(),
-                'Maximum': final_df[stat_key].max()
-            }
-        
-        # Convert to DataFrame and round numbers
-        summary_df = pd.DataFrame(summary_stats).T.round(2)
+        with stage('aggregate.match_summary'):
+            summary_df = match_data.summary(stats_to_analyze.keys(), final_rows).rename(index=stats_to_analyze)
+
+            # Round numbers
+            summary_df = summary_df.astype('float64').round(2)
         
         # Display the table
-        st.write(summary_df)
+        with stage('render.match_summary'):
+            st.write(summary_df)
 
-    st.markdown("---")
+
+@st.fragment
+@traced('match_analysis')
+def match_analysis(window):
     st.title("Match Analysis Dashboard")
 
-    # Load match data
-    from src.match_data import get_match
-    match_df = get_match()
+    # Load match data from the shared dataset
+    match_data = get_match_dataset(window)
+
+    if match_data is not None:
+        match_index = match_data.lookup
 
-    if match_df is not None:
         # Define metrics for match analysis
         match_metrics = {
             'Kills': 'nb_kill',
@@ -279,18 +311,19 @@ if st.session_state.data is not None:
         }
 
         # Select match ID
-        game_ids = sorted(match_df['game_id'].unique())
+        game_ids = match_index.games
         selected_game_ids = st.multiselect(
             "Select matches to analyze",
             options=game_ids,
             default=[game_ids[0]] if game_ids else None
         )
 
-        # Filter by selected matches
-        match_df_filtered = match_df[match_df['game_id'].isin(selected_game_ids)]
+        # Rows of the selected matches
+        with stage('filter.game_rows'):
+            match_rows = match_index.game_rows(selected_game_ids)
 
-        # Select players from filtered matches
-        match_players = sorted(match_df_filtered['nick'].unique())
+            # Select players from filtered matches
+            match_players = match_index.players_in(match_rows)
         selected_match_players = st.multiselect(
             "Select players to analyze",
             options=match_players,
@@ -306,18 +339,21 @@ if st.session_state.data is not None:
         selected_match_metric = match_metrics[selected_match_metric_name]
 
         # Filter for selected players
-        final_df = match_df_filtered[match_df_filtered['nick'].isin(selected_match_players)]
+        with stage('filter.keep_players'):
+            final_rows = match_index.keep_players(match_rows, selected_match_players)
 
         # Create visualization
         st.subheader(f"{selected_match_metric_name} by Player and Match")
         
         # Pivot and plot
-        pivot_match_df = final_df.pivot(
-            index='game_id',
-            columns='nick',
-            values=selected_match_metric
-        )
-        st.bar_chart(pivot_match_df)
+        with stage('aggregate.match_pivot'):
+            pivot_match_df = match_data.frame(['game_id', 'nick', selected_match_metric], final_rows).pivot(
+                index='game_id',
+                columns='nick',
+                values=selected_match_metric
+            )
+        with stage('render.bar_chart'):
+            bar_chart(pivot_match_df)
 
         # Detailed statistics table
         st.subheader("Match Details")
@@ -356,25 +392,43 @@ if st.session_state.data is not None:
             'damage_hits': 'Damage Hit'
         }
 
-        # Create a copy of the filtered DataFrame with renamed columns
-        display_df = final_df[display_columns.keys()].copy()
-        display_df.columns = display_columns.values()
-        
-        # Format datetime column
-        display_df['Date'] = display_df['Date'].dt.strftime('%Y-%m-%d %H:%M')
-        
-        # Round floating point numbers
-        float_columns = ['ADR', 'KDR', 'HS%', 'KAST', 'Damage Share %', 'Kills Share %']
-        display_df[float_columns] = display_df[float_columns].round(2)
-
-        # Display the table
-        st.dataframe(
-            display_df.sort_values(['Game ID', 'Team', 'Nick']),
-            hide_index=True,
-            use_container_width=True
+        # Sorted and paged on the server
+        paginated_table(
+            match_data,
+            final_rows,
+            display_columns,
+            format_match_page,
+            default_sort=['game_id', 'team', 'nick'],
+            key="match_analysis_table"
         )
 
 
+# Add a refresh button. The reload runs in the background, this run keeps
+# the current data and the next one picks up the new version
+if st.button('Refresh Data'):
+    refresh_datasets()
+
+window = month_window()
+player_data = load_data(window)
+show_data_version(window)
+
+# Only show the dashboard if we have data
+if player_data is not None:
+    player_dashboard(player_data)
+
+    # Add a divider between sections
+    st.markdown("---")
+
+    player_match_history(window)
+
+    st.markdown("---")
+
+    match_analysis(window)
+
+# Stage timings and cache counters, opt-in with ?debug=1
+if debug_enabled():
+    with st.sidebar:
+        debug_panel()
 
 # Add custom CSS
 st.markdown("""
@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+from src.schema import widen_floats
+from src.metrics import MetricFrame, mean_of, scaled
+
+# Aggregates behind the "Dashboard Player Analysis" section, built once per
+# data version for every metric. Switching metrics or players only slices them.
+
+
+class PlayerCube:
+
+    def __init__(self, monthly, summary):
+        # monthly: metric -> DataFrame (mes x nome) of monthly means
+        # summary: DataFrame indexed by nome with (metric, mean/min/max) columns
+        self.monthly = monthly
+        self.summary = summary
+        self.players = sorted(summary.index)
+
+    def chart(self, metric, players):
+        pivot = self.monthly[metric]
+        selected = set(players)
+        pivot = pivot[[player for player in pivot.columns if player in selected]]
+        # Months where none of the selected players has data are left out
+        return pivot.dropna(how='all')
+
+    def stats(self, metric, players):
+        summary = self.summary[metric]
+        return summary[summary.index.isin(players)]
+
+
+def player_aggregates(metric_frame, metrics):
+    # float32 stats are widened first so the min/max values are exact
+    metrics = list(metrics)
+    df = widen_floats(metric_frame.frame(['mes', 'nome'] + metrics))
+
+    # Exact sums per player-month, one groupby for all metrics at once; the
+    # player totals are sums of those
+    values = scaled(df[metrics]).groupby([df['mes'], df['nome']], observed=True)
+    totals, counts = values.sum(), values.count()
+    means = mean_of(totals, counts)
+
+    average = mean_of(totals.groupby(level='nome', observed=True).sum(), counts.groupby(level='nome', observed=True).sum())
+    extremes = df.groupby('nome', observed=True)[metrics].agg(['min', 'max'])
+    summary = pd.concat({
+        metric: pd.DataFrame({'Average': average[metric], 'Minimum': extremes[(metric, 'min')], 'Maximum': extremes[(metric, 'max')]})
+        for metric in metrics
+    }, axis=1).round(2)
+    return means, summary
+
+
+def build_player_cube(metric_frame, metrics):
+    means, summary = player_aggregates(metric_frame, metrics)
+    monthly = {metric: means[metric].unstack('nome') for metric in metrics}
+    return PlayerCube(monthly, summary)
+
+
+def concat_parts(parts, axis=0):
+    # Parts without values are left out, pandas is changing how they count
+    # towards the result dtype; the first one stands in when all are empty
+    filled = [part for part in parts if part.size]
+    return pd.concat(filled, axis=axis) if filled else parts[0]
+
+
+def update_player_cube(cube, metric_frame, metrics, players):
+    # Aggregates of `players` are recomputed from their rows of metric_frame,
+    # every other player's are taken from `cube` unchanged
+    if not players:
+        return cube
+    rows = np.flatnonzero(metric_frame.get('nome').isin(players))
+    part = MetricFrame(metric_frame.df.take(rows), metric_frame.registry)
+    means, summary = player_aggregates(part, metrics)
+
+    monthly = {}
+    for metric in metrics:
+        kept = cube.monthly[metric].drop(columns=players, errors='ignore')
+        pivot = concat_parts([kept, means[metric].unstack('nome')], axis=1).sort_index().sort_index(axis=1)
+        # Months whose only rows were removed are left out, as in a full build
+        monthly[metric] = pivot.dropna(how='all')
+    summary = concat_parts([cube.summary.drop(index=players, errors='ignore'), summary]).sort_index()
+    return PlayerCube(monthly, summary)
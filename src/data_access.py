@@ -0,0 +1,369 @@
+import os
+import threading
+from collections import OrderedDict
+from functools import partial
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from src.data_read import get_data, data_fingerprint, data_months
+from src.match_data import MATCH_FILE, get_match, match_fingerprint, match_months
+from src.form_lead import get_form_lead
+from src.match_store import history_paths, partition_paths, read_store
+from src.metrics import MATCH_METRICS, PLAYER_METRICS, MetricFrame
+from src.match_index import MatchIndex
+from src.cube import build_player_cube, update_player_cube
+from src.form import FORM_METRICS, PlayerForm
+from src.schema import append_rows, row_hashes
+from src.snapshot import fingerprint
+from src.partitions import last_months
+from src.sql_backend import load_player_database, load_match_database
+from src.instrument import count, stage
+
+# GC_BACKEND=duckdb answers the dashboard from DuckDB queries, see src/sql_backend.py
+BACKEND = os.environ.get('GC_BACKEND', 'pandas')
+
+
+class SharedDataset:
+    # One parsed copy per process, shared by every Streamlit session. Sessions
+    # only hold references to it and must treat it as read-only.
+    # Only the very first load runs on the request path. After it a watcher
+    # thread checks the source fingerprint every check_interval and rebuilds
+    # in the background when it changes (or when refresh() is called), then
+    # swaps the new version in. Reruns already holding the old version finish
+    # with it, the next ones get the new one.
+    # `update(previous)`, when given, builds the new version from the previous
+    # one and only what changed, or returns None when a full load is needed.
+    # A version replaced or dropped with close() is closed (when it has a
+    # close(), like the DuckDB datasets) after retire_after seconds, once the
+    # reruns still using it are done.
+
+    def __init__(self, name, fingerprint, load, update=None, check_interval=30, retire_after=60):
+        self.name = name
+        self.fingerprint = fingerprint
+        self.load = load
+        self.update = update
+        self.check_interval = check_interval
+        self.retire_after = retire_after
+        self._lock = threading.Lock()
+        # (value, source fingerprint, loaded at), replaced as a whole
+        self._version = (None, None, None)
+        self._wake = threading.Event()
+        self._watcher = None
+        self._closed = False
+        self.refreshing = False
+
+    def get(self):
+        value = self._version[0]
+        if value is not None:
+            count(f'dataset.{self.name}.hit')
+            return value
+
+        with self._lock:
+            # Nothing to serve yet, the first session waits for the load
+            if self._version[0] is None:
+                self._reload()
+            value = self._version[0]
+        if value is not None:
+            self._start_watcher()
+        return value
+
+    @property
+    def loaded_at(self):
+        return self._version[2]
+
+    def refresh(self):
+        # Reload in the background now instead of waiting for the next check
+        if self._version[0] is None:
+            return
+        self.refreshing = True
+        self._wake.set()
+
+    def close(self):
+        # Stops the watcher, which then retires the value; sessions still
+        # holding it keep using it until then
+        self._closed = True
+        self._wake.set()
+
+    def _retire(self, value):
+        close = getattr(value, 'close', None)
+        if close is not None:
+            timer = threading.Timer(self.retire_after, close)
+            timer.daemon = True
+            timer.start()
+
+    def _reload(self):
+        # The fingerprint is taken before loading, a change made during the
+        # load is picked up by the next check
+        try:
+            current = self.fingerprint()
+        except OSError:
+            current = None
+
+        value = None
+        previous = self._version[0]
+        if previous is not None and self.update is not None:
+            count(f'dataset.{self.name}.update')
+            try:
+                with stage(f'update.{self.name}'):
+                    value = self.update(previous)
+            except Exception as e:
+                print(f"Error updating {self.name}, loading it again: {str(e)}")
+
+        if value is None:
+            count(f'dataset.{self.name}.miss')
+            with stage(f'load.{self.name}'):
+                value = self.load()
+        # Failed loads keep the previous version, the next check tries again
+        if value is not None:
+            self._version = (value, current, datetime.now())
+            if previous is not None and value is not previous:
+                self._retire(previous)
+
+    def _start_watcher(self):
+        with self._lock:
+            if self._watcher is None:
+                self._watcher = threading.Thread(target=self._watch, name=f'refresh-{self.name}', daemon=True)
+                self._watcher.start()
+
+    def _watch(self):
+        while True:
+            forced = self._wake.wait(self.check_interval)
+            self._wake.clear()
+            if self._closed:
+                with self._lock:
+                    value = self._version[0]
+                    self._version = (None, None, None)
+                self._retire(value)
+                return
+            try:
+                current = self.fingerprint()
+            except OSError:
+                current = None
+            if forced or current != self._version[1]:
+                self.refreshing = True
+                count(f'dataset.{self.name}.refresh')
+                try:
+                    with self._lock:
+                        self._reload()
+                except Exception as e:
+                    print(f"Error refreshing {self.name}: {e}")
+                finally:
+                    self.refreshing = False
+            else:
+                count(f'dataset.{self.name}.fresh')
+
+
+class PlayerData(MetricFrame):
+    # Player-month frame with lazy metrics and the dashboard cube. Given the
+    # cube of the previous version, only the players in `changed` are aggregated.
+
+    def __init__(self, df, cube=None, changed=None):
+        super().__init__(df, PLAYER_METRICS)
+        metrics = [column for column in df.columns if column not in ('mes', 'id', 'nome')]
+        if cube is None:
+            with stage('aggregate.player_cube'):
+                self.cube = build_player_cube(self, metrics + list(PLAYER_METRICS))
+        else:
+            with stage('update.player_cube'):
+                self.cube = update_player_cube(cube, self, metrics + list(PLAYER_METRICS), changed)
+
+
+class MatchData(MetricFrame):
+    # Match frame with lazy metrics, per-player form metrics and a
+    # player/game row index.
+    # `sources` is the (workbook fingerprint, store partitions, partitions
+    # before the window) it was read from; `lead` the form of its players at
+    # the start of the window (see src/form.py).
+
+    def __init__(self, df, sources=None, previous=None, lead=None):
+        super().__init__(df, MATCH_METRICS)
+        self.sources = sources
+        with stage('index.matches'):
+            self.lookup = MatchIndex(df, previous.lookup if previous is not None else None)
+        if previous is None:
+            self.form = PlayerForm(df, lead=lead)
+        else:
+            with stage('update.player_form'):
+                self.form = previous.form.extended(df)
+
+    def __contains__(self, name):
+        return name in FORM_METRICS or super().__contains__(name)
+
+    def get(self, name):
+        if name in FORM_METRICS:
+            return self.form.get(name)
+        return super().get(name)
+
+    def append(self, rows, sources):
+        # New version with `rows` added. Rows of a (game_id, nick) already
+        # loaded are dropped, as in get_match(); games above the game_id
+        # watermark cannot be loaded yet, so only the others are looked up.
+        touched = []
+        if self.lookup.games:
+            older = rows['game_id'] <= self.lookup.games[-1]
+            touched = sorted(set(rows.loc[older, 'game_id'].tolist()) & set(self.lookup.games))
+        if touched:
+            loaded = self.df[['game_id', 'nick']].take(self.lookup.game_rows(touched))
+            seen = pd.MultiIndex.from_frame(loaded.astype({'nick': 'string'}))
+            rows = rows[~pd.MultiIndex.from_frame(rows[['game_id', 'nick']]).isin(seen)]
+            touched = sorted(set(rows['game_id'].tolist()) & set(touched))
+
+        with stage('append.matches'):
+            df = append_rows(self.df, rows)
+        data = MatchData(df, sources, self)
+
+        # Derived columns only change for the new rows and the games they joined
+        with stage('update.match_metrics'):
+            data.carry_over(self, np.concatenate([self.lookup.game_rows(touched), np.arange(len(self.df), len(df))]))
+            # Sorts already used are ready before the new version is served;
+            # sessions may still be adding to self._ranks, it is copied first
+            for columns in list(self._ranks):
+                data.rank(columns)
+        return data
+
+
+def load_player_data(window=None):
+    df = get_data(window=window)
+    return PlayerData(df) if df is not None else None
+
+
+def update_player_data(previous, window=None):
+    # The workbook is rewritten as a whole, so its months in the window are
+    # read again and diffed with the previous rows; only players with added,
+    # changed or removed rows get their aggregates recomputed
+    df = get_data(window=window)
+    if df is None:
+        return None
+    with stage('diff.players'):
+        old_hashes, new_hashes = row_hashes(previous.df), row_hashes(df)
+        added = df['nome'][~new_hashes.isin(old_hashes)]
+        removed = previous.df['nome'][~old_hashes.isin(new_hashes)]
+        changed = sorted(set(added.tolist()) | set(removed.tolist()))
+    return PlayerData(df, previous.cube, changed)
+
+
+def load_match_data(window=None):
+    # Sources are taken before reading, a partition written meanwhile is
+    # picked up by the next update
+    try:
+        workbook = fingerprint(MATCH_FILE)
+    except OSError:
+        workbook = None
+    partitions = partition_paths(window)
+    history = history_paths(window)
+    df = get_match(partitions=partitions, window=window)
+    if df is None:
+        return None
+    # Form metrics continue from each player's matches before the window
+    return MatchData(df, (workbook, partitions, history), lead=get_form_lead(window))
+
+
+def update_match_data(previous, window=None):
+    # The store is append-only: with the same workbook and every loaded
+    # partition still there, only the new partitions of the window are read.
+    # Matches added before the window change the form leads, a full load
+    # takes them in.
+    if previous.sources is None:
+        return None
+    workbook, loaded, history = previous.sources
+    try:
+        current = fingerprint(MATCH_FILE)
+    except OSError:
+        return None
+    partitions = partition_paths(window)
+    if current != workbook or not set(loaded) <= set(partitions) or history_paths(window) != history:
+        return None
+
+    added = [path for path in partitions if path not in set(loaded)]
+    if not added:
+        return previous
+    rows = read_store(added, window)
+    return previous.append(rows, (workbook, partitions, history))
+
+
+LOADERS = {
+    'pandas': (load_player_data, load_match_data),
+    'duckdb': (load_player_database, load_match_database),
+}
+
+# Incremental refresh; the DuckDB databases are rebuilt from the snapshots
+UPDATERS = {
+    'pandas': (update_player_data, update_match_data),
+    'duckdb': (None, None),
+}
+
+if BACKEND not in LOADERS:
+    raise ValueError(f"Unknown GC_BACKEND {BACKEND!r}, expected one of {', '.join(LOADERS)}")
+
+# Month windows most recently asked for keep their datasets loaded; an older
+# window is dropped, and loaded again if a session comes back to it
+MAX_WINDOWS = 4
+
+# Window shown when a session opens the dashboard
+DEFAULT_MONTHS = 3
+
+_windows = OrderedDict()
+_windows_lock = threading.Lock()
+
+
+def window_datasets(window):
+    # (players, matches) datasets holding only the months of `window`
+    window = tuple(window) if window is not None else None
+    with _windows_lock:
+        datasets = _windows.get(window)
+        if datasets is None:
+            label = 'all' if window is None else f'{window[0]}_{window[1]}'
+            count('dataset.window.miss')
+            datasets = (
+                SharedDataset(f'players@{label}', data_fingerprint, partial(LOADERS[BACKEND][0], window), updater(UPDATERS[BACKEND][0], window)),
+                SharedDataset(f'matches@{label}', match_fingerprint, partial(LOADERS[BACKEND][1], window), updater(UPDATERS[BACKEND][1], window)),
+            )
+            _windows[window] = datasets
+            while len(_windows) > MAX_WINDOWS:
+                _, dropped = _windows.popitem(last=False)
+                for dataset in dropped:
+                    dataset.close()
+        _windows.move_to_end(window)
+        return datasets
+
+
+def updater(update, window):
+    return partial(update, window=window) if update is not None else None
+
+
+def read_months():
+    return sorted(set(data_months()) | set(match_months()))
+
+
+# Months with player or match data, the choices of the window selector. Kept
+# like the datasets, so a rerun does no I/O; its watcher reads them again
+# when either source changes
+_months = SharedDataset('months', lambda: f'{data_fingerprint()}|{match_fingerprint()}', read_months)
+
+
+def available_months():
+    return _months.get()
+
+
+def default_window():
+    return last_months(available_months(), DEFAULT_MONTHS)
+
+
+def get_player_dataset(window=None):
+    return window_datasets(window)[0].get()
+
+
+def get_match_dataset(window=None):
+    return window_datasets(window)[1].get()
+
+
+def refresh_datasets():
+    # Returns immediately, the new versions are swapped in when loaded
+    with _windows_lock:
+        datasets = [_months] + [dataset for pair in _windows.values() for dataset in pair]
+    for dataset in datasets:
+        dataset.refresh()
+
+
+def dataset_versions(window=None):
+    return {dataset.name.split('@')[0]: (dataset.loaded_at, dataset.refreshing) for dataset in window_datasets(window)}
@@ -1,39 +1,49 @@
-import pandas as pd
+import os
 import streamlit as st
 import openpyxl
+from src.schema import PLAYER_DTYPES, compact_frame, memory_report
+from src.workbook import read_typed
+from src.snapshot import fingerprint, ensure_snapshot, latest_dir, load_snapshot, snapshot_months
+from src.partitions import window_rows
+from src.instrument import stage
+from src.paths import DATA_DIR
 
-def get_data():
+DATA_FILE = os.path.join(DATA_DIR, 'teste_gc.xlsx')
+
+def read_workbook(path):
+    # Read the Excel file already typed, derived columns saved by the loader
+    # are not read: per-map ratios are derived lazily, see src/metrics.py
+    df = read_typed(path, PLAYER_DTYPES)
+
+    df.fillna(0, inplace = True)
+
+    return df
+
+def data_fingerprint():
+    return fingerprint(DATA_FILE)
+
+def data_months():
+    # Months of the snapshot partitions. A snapshot that is behind the workbook
+    # still answers, the dataset refresh rebuilds it; one is built if there is none
     try:
-        # Read the Excel file
-        df = pd.read_excel('src/teste_gc.xlsx')
-        print(df)
-        # Ensure proper data types
-        df = df.astype({
-            'mes': 'datetime64[ns]', 
-            'id': 'int', 
-            'nome': 'string', 
-            'kdr': 'float64', 
-            'adr': 'float64', 
-            'matou': 'int', 
-            'morreu': 'int', 
-            'multikills': 'int', 
-            'firstkills': 'int', 
-            'headshotrate': 'float', 
-            'bomb_planted': 'int', 
-            'bomb_defused': 'int', 
-            'matches': 'int'
-        })
-
-        # Calculate additional metrics
-        df["killsPerMap"] = (df["matou"]/df["matches"]).round(2)
-        df["deatchsPerMap"] = (df["morreu"]/df["matches"]).round(2)
-        df["firstKillsPerMap"] = (df["firstkills"]/df["matches"]).round(2)
-        df["bombPlantedPerMap"] = (df["bomb_planted"]/df["matches"]).round(2)
-        df["bombDefusedPerMap"] = (df["bomb_defused"]/df["matches"]).round(2)
-
-        df.fillna(0, inplace = True)
-
-        print(df)
+        return snapshot_months(latest_dir('players') or ensure_snapshot(DATA_FILE, 'players', read_workbook, 'mes'))
+    except Exception as e:
+        print(f"Error loading data: {str(e)}")
+        return []
+
+def get_data(use_snapshot=True, compact=True, window=None):
+    try:
+        # The snapshot is rebuilt from the workbook whenever the workbook changes,
+        # only the months in `window` are read from it
+        if use_snapshot:
+            df = load_snapshot(DATA_FILE, 'players', read_workbook, 'mes', window)
+        else:
+            df = window_rows(read_workbook(DATA_FILE), 'mes', window)
+
+        # Narrow dtypes keep the resident frame small
+        if compact:
+            with stage('compact.players'):
+                df = compact_frame(df)
 
         return df
     except Exception as e:
@@ -41,5 +51,5 @@ def get_data():
         return None
 
 if __name__ == "__main__":
-    get_data()
-
+    print(memory_report(get_data(compact=False)))
+    print(memory_report(get_data()))
@@ -0,0 +1,49 @@
+import os
+import json
+import functools
+import pandas as pd
+import streamlit as st
+from src.instrument import collect, stage, recorder, metrics_text
+
+# Opt-in debug panel in the sidebar, shown with ?debug=1 in the URL or
+# GC_DEBUG=1 in the environment. It lists the stages of the last run of each
+# dashboard section for this session, plus the process-wide totals.
+
+
+def debug_enabled():
+    return os.environ.get('GC_DEBUG') == '1' or st.query_params.get('debug') == '1'
+
+
+def traced(section):
+    # Times a dashboard section and keeps its stages for this session's panel
+    def wrap(func):
+        @functools.wraps(func)
+        def run(*args, **kwargs):
+            with collect() as trace:
+                with stage(f'section.{section}'):
+                    result = func(*args, **kwargs)
+            st.session_state.setdefault('stage_traces', {})[section] = trace
+            return result
+        return run
+    return wrap
+
+
+@st.fragment
+def debug_panel():
+    st.subheader("Debug")
+    # Fragment reruns only update their own section, this reruns the panel
+    st.button("Update timings", key="debug_update")
+
+    for section, trace in st.session_state.get('stage_traces', {}).items():
+        st.caption(f"Last run: {section}")
+        st.dataframe(pd.DataFrame(trace, columns=['Stage', 'ms']).round(2), hide_index=True)
+
+    snapshot = recorder.snapshot()
+    st.caption("Process totals")
+    stages = pd.DataFrame.from_dict(snapshot['stages'], orient='index')
+    st.dataframe(stages.sort_index().round(2))
+    st.caption("Cache hits and misses")
+    st.dataframe(pd.Series(snapshot['counters'], name='count', dtype='int64').sort_index())
+
+    st.download_button("Download JSON", json.dumps(snapshot, indent=2), file_name='timings.json', mime='application/json')
+    st.download_button("Download Prometheus metrics", metrics_text(snapshot), file_name='metrics.prom', mime='text/plain')
@@ -0,0 +1,138 @@
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+# Chart data is reduced to a point budget before it is sent to the browser:
+# line series with LTTB (largest triangle three buckets), which keeps peaks
+# and the overall shape, and per-game bars by averaging runs of consecutive
+# games. Data already within budget is charted unchanged; past it, only the
+# series with the largest totals are kept when there are too many of them to
+# give each a few points.
+
+POINT_BUDGET = 1500
+
+MAX_BAR_SERIES = 20
+
+# Fewest points a line series keeps, a line needs its two ends and a middle
+MIN_LINE_POINTS = 3
+
+
+def lttb(x, y, n_out):
+    # Positions of the n_out points of (x, y) that best keep the shape
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    every = (n - 2) / (n_out - 2)
+    selected = np.empty(n_out, dtype=np.intp)
+    selected[0] = 0
+    a = 0
+    for i in range(n_out - 2):
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, n)
+
+        # Average of the next bucket is the third corner of the triangle
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+
+        xs = x[start:end]
+        ys = y[start:end]
+        area = np.abs((x[a] - avg_x) * (ys - y[a]) - (x[a] - xs) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+    selected[-1] = n - 1
+    return selected
+
+
+def top_series(df, n):
+    # The n columns with the largest absolute totals, in their table order
+    if len(df.columns) <= n:
+        return df
+    top = df.abs().sum().nlargest(n).index
+    return df[[column for column in df.columns if column in top]]
+
+
+def downsample_lines(pivot, value_name, budget=POINT_BUDGET):
+    # Wide (x index, one column per series) -> long frame with at most
+    # budget points overall, each series reduced on its own
+    x_name = pivot.index.name or 'index'
+    series_name = pivot.columns.name or 'series'
+    pivot = top_series(pivot, max(1, budget // MIN_LINE_POINTS))
+    per_series = max(MIN_LINE_POINTS, budget // max(1, len(pivot.columns)))
+
+    index = pivot.index.to_numpy()
+    x_all = index.astype('int64') if np.issubdtype(index.dtype, np.datetime64) else index
+    x_all = x_all.astype('float64')
+
+    # Arrays are gathered per series and joined once, one frame per series is slow with many players
+    data = pivot.to_numpy(dtype='float64')
+    xs, names, values = [], [], []
+    for j, column in enumerate(pivot.columns):
+        y = data[:, j]
+        present = np.flatnonzero(~np.isnan(y))
+        keep = present[lttb(x_all[present], y[present], per_series)]
+        xs.append(index[keep])
+        names.append(np.full(len(keep), str(column), dtype=object))
+        values.append(y[keep])
+
+    if not xs:
+        return pd.DataFrame(columns=[x_name, series_name, value_name])
+    return pd.DataFrame({
+        x_name: np.concatenate(xs),
+        series_name: np.concatenate(names),
+        value_name: np.concatenate(values),
+    })
+
+
+def line_chart(pivot, value_name, budget=POINT_BUDGET):
+    if pivot.size <= budget:
+        st.line_chart(pivot)
+        return
+    long_df = downsample_lines(pivot, value_name, budget)
+    st.line_chart(long_df, x=long_df.columns[0], y=value_name, color=long_df.columns[1])
+    notes = []
+    shown = long_df[long_df.columns[1]].nunique()
+    if shown < len(pivot.columns):
+        notes.append(f"top {shown} of {len(pivot.columns)} players")
+    notes.append(f"{len(long_df)} of {int(pivot.notna().sum().sum())} points")
+    st.caption("Showing " + ", ".join(notes))
+
+
+def bin_bars(df, n_bins):
+    # Averages runs of consecutive rows so at most n_bins bars remain,
+    # labelled with the first and last index value of each run
+    df = df.sort_index()
+    bins = np.arange(len(df)) * n_bins // len(df)
+    binned = df.groupby(bins).mean()
+    starts = np.searchsorted(bins, binned.index.to_numpy())
+    ends = np.append(starts[1:], len(df)) - 1
+    first = df.index[starts]
+    last = df.index[ends]
+    binned.index = [f"{a}" if a == b else f"{a}–{b}" for a, b in zip(first, last)]
+    binned.index.name = df.index.name
+    return binned
+
+
+def reduce_bars(df, budget=POINT_BUDGET, max_series=MAX_BAR_SERIES):
+    # Past the budget, keep the max_series series with the largest totals,
+    # then bin the rows so bars x series stays within budget
+    notes = []
+    if df.size <= budget:
+        return df, notes
+    if len(df.columns) > max_series:
+        notes.append(f"top {max_series} of {len(df.columns)} players")
+        df = top_series(df, max_series)
+
+    n_bins = max(1, budget // max(1, len(df.columns)))
+    if len(df) > n_bins:
+        notes.append(f"{len(df)} matches averaged into {n_bins} bars")
+        df = bin_bars(df, n_bins)
+    return df, notes
+
+
+def bar_chart(df, budget=POINT_BUDGET):
+    df, notes = reduce_bars(df, budget)
+    st.bar_chart(df)
+    if notes:
+        st.caption("Showing " + ", ".join(notes))
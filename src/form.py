@@ -0,0 +1,250 @@
+import numpy as np
+import pandas as pd
+from src.schema import widen_floats
+
+# Form of a player: the mean of a stat over their last matches and an
+# exponentially weighted mean of it, over the player's matches in updated_at
+# order (table position breaks ties). Both are computed for the whole table
+# with grouped windows. When rows are appended, PlayerForm.extended continues
+# each affected player from the tail of their previous matches instead.
+# A table holding one month window continues the same way from a lead: the
+# context of each player's matches before the window (PlayerForm.leads()), so
+# its values are the ones of the player's whole history. Leads are kept per
+# month (src/form_lead.py), each continuing the one of the month before.
+
+
+class RollingMean:
+    # Mean over the player's last `window` matches, the current one included
+
+    def __init__(self, column, window):
+        self.column = column
+        self.window = window
+
+    def compute(self, values, starts):
+        # values grouped by player in match order, starts[i] = position where
+        # row i's group starts. One vectorized pass per window offset.
+        # row i adds the value k rows back while that row is in its group
+        present = ~np.isnan(values)
+        filled = np.where(present, values, 0.0)
+        offset = np.arange(len(values)) - starts
+        total = filled.copy()
+        n = present.astype('float64')
+        for k in range(1, min(self.window, len(values))):
+            take = (offset[k:] >= k) & present[:-k]
+            total[k:] += np.where(take, filled[:-k], 0.0)
+            n[k:] += take
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return total / n
+
+    def context(self, values, previous, rows, lead):
+        # Stats of the player's last window - 1 matches, those of the lead included
+        values = np.concatenate([lead, values[rows]])
+        return values[max(0, len(values) - self.window + 1):]
+
+
+class Ewma:
+    # Exponentially weighted mean, alpha = 2 / (span + 1): every match moves
+    # the previous value towards its stat
+
+    def __init__(self, column, span):
+        self.column = column
+        self.span = span
+
+    def compute(self, values, starts):
+        means = pd.Series(values).groupby(starts).ewm(span=self.span, adjust=False).mean()
+        return means.to_numpy()
+
+    def context(self, values, previous, rows, lead):
+        # The player's last value carries their whole history. Matches since
+        # their last stat still decay its weight, they are kept as NaN.
+        if not len(rows):
+            return lead
+        present = np.flatnonzero(~np.isnan(np.concatenate([lead, values[rows]])))
+        if not len(present):
+            return previous[rows[-1:]]
+        trailing = len(lead) + len(rows) - 1 - present[-1]
+        return np.r_[previous[rows[-1:]], np.full(trailing, np.nan)]
+
+
+FORM_WINDOW = 10
+
+FORM_METRICS = {
+    'adr_last10': RollingMean('adr', FORM_WINDOW),
+    'kdr_last10': RollingMean('kdr', FORM_WINDOW),
+    'rating_last10': RollingMean('rating', FORM_WINDOW),
+    'adr_ewma': Ewma('adr', FORM_WINDOW),
+    'kdr_ewma': Ewma('kdr', FORM_WINDOW),
+    'rating_ewma': Ewma('rating', FORM_WINDOW),
+}
+
+
+NO_LEAD = np.zeros(0)
+
+
+def nick_keys(series):
+    # Nicks as plain objects, missing ones as None
+    return series.astype(object).where(series.notna(), None).to_numpy()
+
+
+def compute_blocks(metric, values, blocks, out):
+    # Computes the (lead, rows in match order) blocks of one player each into
+    # out; leads are context only, their results are dropped
+    segments, targets, leads = [], [], []
+    for lead, rows in blocks:
+        segments.append(np.concatenate([lead, values[rows]]))
+        targets.append(rows)
+        leads.append(np.r_[np.ones(len(lead), bool), np.zeros(len(rows), bool)])
+    if segments:
+        lengths = [len(segment) for segment in segments]
+        starts = np.repeat(np.cumsum([0] + lengths[:-1]), lengths)
+        computed = metric.compute(np.concatenate(segments), starts)
+        out[np.concatenate(targets)] = computed[~np.concatenate(leads)]
+
+
+class PlayerForm:
+    # Form columns of one match table, computed on first use. The rows
+    # grouped by player in match order are the per-player state an append
+    # continues from: block i is _order[_bounds[i]:_bounds[i + 1]].
+    # `lead` is the context of the matches before this table, by metric name
+    # and nick, as returned by leads() of the table holding them.
+
+    def __init__(self, df, registry=FORM_METRICS, lead=None):
+        self.df = df
+        self.registry = registry
+        self.lead = lead or {}
+        self._order = None
+        self._bounds = None
+        self._blocks = None
+        # Unrounded values in table order; the EWMA continues from them
+        self._values = {}
+        self._columns = {}
+
+    def _times(self):
+        return self.df['updated_at'].to_numpy(dtype='datetime64[ns]').view('int64')
+
+    def _stat(self, column):
+        return widen_floats(self.df[[column]])[column].to_numpy(dtype='float64')
+
+    def _sort(self):
+        if self._order is not None:
+            return
+        codes, _ = pd.factorize(self.df['nick'])
+        order = np.lexsort((self._times(), codes))
+        sorted_codes = codes[order]
+        starts = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]]) if len(order) else np.zeros(0, np.intp)
+        # The form is shared by all sessions: _order is published last, so a
+        # session that sees it set also sees _bounds and _blocks
+        self._bounds = np.append(starts, len(order))
+        self._blocks = {nick: i for i, nick in enumerate(nick_keys(self.df['nick'].take(order[starts])))}
+        self._order = order
+
+    def _lead(self, name, nick):
+        return self.lead.get(name, {}).get(nick, NO_LEAD)
+
+    def _block(self, block):
+        return self._order[self._bounds[block]:self._bounds[block + 1]]
+
+    def get(self, name):
+        if name not in self._columns:
+            if name not in self._values:
+                self._sort()
+                metric = self.registry[name]
+                stats = self._stat(metric.column)
+                values = np.empty(len(self.df))
+                if self.lead.get(name):
+                    # Players continue from their lead, one block at a time
+                    compute_blocks(metric, stats, [(self._lead(name, nick), self._block(block)) for nick, block in self._blocks.items()], values)
+                else:
+                    starts = np.repeat(self._bounds[:-1], np.diff(self._bounds))
+                    values[self._order] = metric.compute(stats[self._order], starts)
+                self._values[name] = values
+            self._columns[name] = pd.Series(self._values[name], index=self.df.index, name=name).round(2)
+        return self._columns[name]
+
+    def leads(self):
+        # Context of every player's last matches here, by metric name and
+        # nick: the lead of a table holding the matches that follow. Players
+        # without matches here keep the lead they came with.
+        self._sort()
+        result = {}
+        for name, metric in self.registry.items():
+            result[name] = dict(self.lead.get(name, {}))
+            if not len(self.df):
+                continue
+            self.get(name)
+            stats = self._stat(metric.column)
+            result[name].update({
+                nick: metric.context(stats, self._values[name], self._block(block), self._lead(name, nick))
+                for nick, block in self._blocks.items()
+            })
+        return result
+
+    def extended(self, df):
+        # Form of `df`, this table with rows appended. Computed columns are
+        # carried over: a player whose new matches come after their last one
+        # continues from its tail, one with an older match gets their whole
+        # block recomputed, a new player is computed from scratch.
+        form = PlayerForm(df, self.registry, self.lead)
+        if self._order is None:
+            return form
+        n = len(self.df)
+        times = form._times()
+
+        # New rows grouped by player, each group in match order
+        keys = nick_keys(df['nick'].iloc[n:])
+        codes, _ = pd.factorize(keys, use_na_sentinel=False)
+        perm = np.lexsort((times[n:], codes))
+        added = np.arange(n, len(df))[perm]
+        firsts = np.flatnonzero(np.r_[True, codes[perm][1:] != codes[perm][:-1]]) if len(added) else []
+        groups = zip(keys[perm][firsts], np.split(added, firsts[1:]))
+
+        counts = np.zeros(len(self._bounds) - 1, dtype=np.intp)
+        inserts, appended, plans = [], [], []
+        for nick, rows in groups:
+            block = self._blocks.get(nick)
+            if block is None:
+                appended.append((nick, rows))
+                plans.append(('new', nick, None, rows))
+                continue
+            old = self._block(block)
+            counts[block] = len(rows)
+            inserts.append(np.full(len(rows), self._bounds[block + 1]))
+            kind = 'tail' if times[rows[0]] >= times[old[-1]] else 'block'
+            plans.append((kind, nick, block, rows))
+
+        # Order of the new table: rows inserted at the end of their block,
+        # new players' blocks added after the existing ones
+        order = self._order
+        if inserts:
+            order = np.insert(order, np.concatenate(inserts), np.concatenate([rows for kind, nick, block, rows in plans if block is not None]))
+        bounds = self._bounds + np.r_[0, np.cumsum(counts)]
+        for nick, rows in appended:
+            order = np.concatenate([order, rows])
+            bounds = np.append(bounds, len(order))
+        for kind, nick, block, rows in plans:
+            if kind == 'block':
+                region = order[bounds[block]:bounds[block + 1]]
+                order[bounds[block]:bounds[block + 1]] = region[np.argsort(times[region], kind='stable')]
+        form._bounds = bounds
+        form._blocks = dict(self._blocks)
+        for nick, rows in appended:
+            form._blocks[nick] = len(form._blocks)
+        form._order = order
+
+        for name, previous in list(self._values.items()):
+            metric = self.registry[name]
+            values = form._stat(metric.column)
+            blocks = []
+            for kind, nick, block, rows in plans:
+                lead = self._lead(name, nick)
+                if kind == 'tail':
+                    lead = metric.context(values, previous, self._block(block), lead)
+                elif kind == 'block':
+                    rows = order[bounds[block]:bounds[block + 1]]
+                blocks.append((lead, rows))
+
+            result = np.empty(len(df))
+            result[:n] = previous
+            compute_blocks(metric, values, blocks, result)
+            form._values[name] = result
+        return form
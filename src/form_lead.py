@@ -0,0 +1,121 @@
+import os
+import uuid
+import hashlib
+import numpy as np
+import pandas as pd
+from src.form import FORM_METRICS, PlayerForm, nick_keys
+from src.match_data import MATCH_FILE, get_match, match_months
+from src.match_store import partition_paths
+from src.partitions import path_month
+from src.snapshot import SNAPSHOT_DIR, SNAPSHOT_VERSION, fingerprint
+from src.instrument import count, stage
+
+# Form leads (see src/form.py) at the start of every month, saved next to the
+# snapshots: a window load reads the lead of its first month and none of the
+# matches before it. The lead of a month continues the one of the previous
+# month with that month's matches, so a missing lead only reads the months
+# since the last one saved; the first is built from the undated matches.
+# A lead is keyed by the workbook, the store partitions that can hold
+# earlier matches and the form metric definitions, any change makes a new one.
+LEAD_DIR = os.path.join(SNAPSHOT_DIR, 'form_leads')
+
+
+def form_columns():
+    return ['game_id', 'nick', 'updated_at'] + sorted({metric.column for metric in FORM_METRICS.values()})
+
+
+def lead_key(month, workbook, partitions):
+    history = '|'.join(os.path.basename(path) for path in partitions if path_month(path) is None or path_month(path) < month)
+    metrics = repr([(name, type(metric).__name__, vars(metric)) for name, metric in FORM_METRICS.items()])
+    return hashlib.sha1(f'{workbook}|{SNAPSHOT_VERSION}|{history}|{metrics}'.encode()).hexdigest()[:16]
+
+
+def lead_path(month, key):
+    return os.path.join(LEAD_DIR, f'{month}-{key}.parquet')
+
+
+def write_lead(path, lead):
+    # One row per context value, in order; players without context are left out
+    pieces = [(name, nick, context) for name, contexts in lead.items() for nick, context in contexts.items() if len(context)]
+    lengths = [len(context) for _, _, context in pieces]
+    df = pd.DataFrame({
+        'metric': pd.Series(np.repeat(np.array([name for name, _, _ in pieces], dtype=object), lengths), dtype='string'),
+        'nick': pd.Series(np.repeat(np.array([nick for _, nick, _ in pieces], dtype=object), lengths), dtype='string'),
+        'value': np.concatenate([context for _, _, context in pieces]) if pieces else np.zeros(0),
+    })
+    os.makedirs(LEAD_DIR, exist_ok=True)
+    tmp = os.path.join(LEAD_DIR, f'.{uuid.uuid4().hex[:8]}.tmp')
+    df.to_parquet(tmp, index=False)
+    os.replace(tmp, path)
+
+    # Leads of the month from other versions of the data are no longer read
+    month = os.path.basename(path).split('-')[:2]
+    for name in os.listdir(LEAD_DIR):
+        if name.split('-')[:2] == month and name != os.path.basename(path):
+            try:
+                os.remove(os.path.join(LEAD_DIR, name))
+            except OSError:
+                pass
+
+
+def read_lead(path):
+    df = pd.read_parquet(path)
+    metrics = df['metric'].astype(object).to_numpy()
+    nicks = nick_keys(df['nick'])
+    values = df['value'].to_numpy(dtype='float64')
+    starts = np.flatnonzero(np.r_[True, (metrics[1:] != metrics[:-1]) | (nicks[1:] != nicks[:-1])]) if len(df) else []
+    lead = {name: {} for name in FORM_METRICS}
+    for start, end in zip(starts, np.append(starts[1:], len(df))):
+        lead[metrics[start]][nicks[start]] = values[start:end]
+    return lead
+
+
+def save_lead(path, lead):
+    try:
+        write_lead(path, lead)
+    except OSError as e:
+        # A read-only checkout still works, it just builds the leads every time
+        print(f"Could not write form lead: {str(e)}")
+
+
+def get_form_lead(window):
+    # Form of every player at the start of `window`, from their matches
+    # before it (and the undated ones); None for the whole history
+    if window is None:
+        return None
+    try:
+        workbook = fingerprint(MATCH_FILE)
+    except OSError:
+        workbook = None
+    partitions = partition_paths()
+    # Leads are kept at the start of every month with matches before the window
+    points = [month for month in match_months() if month < window[0]] + [window[0]]
+    keys = [lead_key(month, workbook, partitions) for month in points]
+
+    first = len(points) - 1
+    while first >= 0 and not os.path.exists(lead_path(points[first], keys[first])):
+        first -= 1
+    if first == len(points) - 1:
+        count('form_lead.hit')
+        return read_lead(lead_path(points[first], keys[first]))
+
+    count('form_lead.miss')
+    with stage('form_lead.matches'):
+        if first >= 0:
+            lead = read_lead(lead_path(points[first], keys[first]))
+        else:
+            rows = get_match(compact=False, columns=form_columns(), undated=True)
+            if rows is None:
+                return None
+            first = 0
+            lead = PlayerForm(rows).leads()
+            save_lead(lead_path(points[0], keys[0]), lead)
+
+        for i in range(first, len(points) - 1):
+            month = points[i]
+            rows = get_match(compact=False, window=(month, month), columns=form_columns())
+            if rows is None:
+                return None
+            lead = PlayerForm(rows, lead=lead).leads()
+            save_lead(lead_path(points[i + 1], keys[i + 1]), lead)
+    return lead
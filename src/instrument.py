@@ -0,0 +1,111 @@
+import os
+import sys
+import json
+import time
+import logging
+import threading
+from contextlib import contextmanager
+
+# Timings of named stages (load, filter, aggregate, format, render) and hit/
+# miss counters of the data caches, aggregated per process. Stages that run
+# inside collect() are also kept as a per-run trace for the debug panel.
+#
+# GC_TIMING_LOG=1 logs every stage and cache event as one JSON line on stderr;
+# metrics_text() renders the aggregates in the Prometheus text format.
+
+logger = logging.getLogger('streamlit_gc.timing')
+
+if os.environ.get('GC_TIMING_LOG') == '1':
+    handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+
+class Recorder:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stages = {}
+        self.counters = {}
+
+    def record(self, name, seconds):
+        with self._lock:
+            count, total, longest = self.stages.get(name, (0, 0.0, 0.0))
+            self.stages[name] = (count + 1, total + seconds, max(longest, seconds))
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def snapshot(self):
+        with self._lock:
+            stages = {
+                name: {'count': count, 'total_ms': total * 1000, 'mean_ms': total * 1000 / count, 'max_ms': longest * 1000}
+                for name, (count, total, longest) in self.stages.items()
+            }
+            return {'stages': stages, 'counters': dict(self.counters)}
+
+    def reset(self):
+        with self._lock:
+            self.stages.clear()
+            self.counters.clear()
+
+
+recorder = Recorder()
+
+_local = threading.local()
+
+
+def log_event(event, **fields):
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(json.dumps({'ts': round(time.time(), 3), 'event': event, **fields}))
+
+
+@contextmanager
+def stage(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        recorder.record(name, elapsed)
+        trace = getattr(_local, 'trace', None)
+        if trace is not None:
+            trace.append((name, elapsed * 1000))
+        log_event('stage', stage=name, ms=round(elapsed * 1000, 3))
+
+
+def count(name):
+    # Cache events are named <cache>.<dataset>.<hit|miss|...>
+    recorder.count(name)
+    log_event('counter', counter=name)
+
+
+@contextmanager
+def collect():
+    # Stages run by this thread inside the block are appended to the yielded list
+    previous = getattr(_local, 'trace', None)
+    _local.trace = []
+    try:
+        yield _local.trace
+    finally:
+        _local.trace = previous
+
+
+def metrics_text(snapshot=None):
+    snapshot = snapshot or recorder.snapshot()
+    lines = [
+        '# TYPE gc_stage_seconds summary',
+    ]
+    for name, stats in sorted(snapshot['stages'].items()):
+        lines.append(f'gc_stage_seconds_count{{stage="{name}"}} {stats["count"]}')
+        lines.append(f'gc_stage_seconds_sum{{stage="{name}"}} {stats["total_ms"] / 1000:.6f}')
+    lines.append('# TYPE gc_stage_seconds_max gauge')
+    for name, stats in sorted(snapshot['stages'].items()):
+        lines.append(f'gc_stage_seconds_max{{stage="{name}"}} {stats["max_ms"] / 1000:.6f}')
+    lines.append('# TYPE gc_cache_events_total counter')
+    for name, value in sorted(snapshot['counters'].items()):
+        lines.append(f'gc_cache_events_total{{event="{name}"}} {value}')
+    return '\n'.join(lines) + '\n'
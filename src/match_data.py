@@ -1,61 +1,59 @@
+import os
 import pandas as pd
 import streamlit as st
 import openpyxl
+from src.schema import MATCH_DTYPES, compact_frame, memory_report
+from src.workbook import read_typed
+from src.snapshot import fingerprint, ensure_snapshot, latest_dir, load_snapshot, snapshot_months
+from src.partitions import window_rows
+from src.instrument import stage
+from src.paths import DATA_DIR
+from src.match_store import read_store, read_undated, store_fingerprint, store_months
 
-def get_match():
-    try:
-        # Read the Excel file
-        df = pd.read_excel('src/match_gc.xlsx')
-        print(df)
-        # Ensure proper data types
-        df = df.astype({
-            'game_id': 'int', 
-            'nick': 'string', 
-            'team': 'string', 
-            'updated_at': 'datetime64[ns]', 
-            'map_name': 'string', 
-            'player_room': 'string', 
-            'nb_kill': 'int', 
-            'assist': 'int', 
-            'death': 'int', 
-            'hs': 'int', 
-            'damage': 'int', 
-            'adr': 'float', 
-            'kdr': 'float',
-            'phs': 'float',
-            'firstkill': 'int',
-            'pkast': 'float',
-            'nb1kill': 'int',
-            'nb2kill': 'int',
-            'nb3kill': 'int',
-            'nb4kill': 'int',
-            'nb5kill': 'int',
-            'defuse': 'int',
-            'bombe': 'int',
-            'hits': 'int',
-            'level': 'int',
-            'rating': 'int',
-            'flash_assist': 'int',
-            'multikills': 'int',
-
+MATCH_FILE = os.path.join(DATA_DIR, 'match_gc.xlsx')
 
+def read_workbook(path):
+    # Read the Excel file already typed, skipping the index column written by to_excel
+    df = read_typed(path, MATCH_DTYPES)
 
-        })
+    # Match shares are derived lazily, see src/metrics.py
+    return df
 
-        df['total_damage_match'] = df.groupby('game_id')['damage'].transform('sum')
-        df['damage_share'] = (df['damage'] / df['total_damage_match'] * 100).round(2)
+def match_fingerprint():
+    # Changes when the workbook is saved again or a partition is appended to the store
+    return f'{fingerprint(MATCH_FILE)}|{store_fingerprint()}'
 
-        # Calculate share of kills for each player in their match
-        df['total_kills_match'] = df.groupby('game_id')['nb_kill'].transform('sum')
-        df['kills_share'] = (df['nb_kill'] / df['total_kills_match'] * 100).round(2)
+def match_months():
+    # Months of the snapshot and match store partitions, as in data_months()
+    try:
+        months = snapshot_months(latest_dir('matches') or ensure_snapshot(MATCH_FILE, 'matches', read_workbook, 'updated_at'))
+    except Exception as e:
+        print(f"Error loading data: {str(e)}")
+        months = []
+    return sorted(set(months) | set(store_months()))
 
-        # Calculate share of kills for each player in their match
-        df['total_hits_match'] = df.groupby('game_id')['hits'].transform('sum')
-        df['hits_share'] = (df['hits'] / df['total_hits_match'] * 100).round(2)
+def get_match(use_snapshot=True, compact=True, partitions=None, window=None, columns=None, undated=False):
+    try:
+        # The snapshot is rebuilt from the workbook whenever the workbook changes,
+        # only the months in `window` (or the rows without a date) are read from it
+        if use_snapshot:
+            df = load_snapshot(MATCH_FILE, 'matches', read_workbook, 'updated_at', window, columns, undated)
+        else:
+            df = read_workbook(MATCH_FILE)
+            df = df[df['updated_at'].isna()].reset_index(drop=True) if undated else window_rows(df, 'updated_at', window)
+            if columns is not None:
+                df = df[columns]
 
-        #Calculate damage per hit
-        df['damage_hits'] = (df['damage'] / df['hits']).round(2)
+        # Games ingested into the append-only store are added on top of the workbook
+        stored = read_undated(columns) if undated else read_store(partitions, window, columns)
+        if stored is not None:
+            df = pd.concat([df, stored], ignore_index=True)
+            df = df.drop_duplicates(subset=['game_id', 'nick'], ignore_index=True)
 
+        # Narrow dtypes keep the resident frame small, applied after the union
+        if compact:
+            with stage('compact.matches'):
+                df = compact_frame(df)
 
         return df
     except Exception as e:
@@ -63,5 +61,5 @@ def get_match():
         return None
 
 if __name__ == "__main__":
-    get_match()
-
+    print(memory_report(get_match(compact=False)))
+    print(memory_report(get_match()))
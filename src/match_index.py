@@ -0,0 +1,101 @@
+import numpy as np
+import pandas as pd
+
+# Row positions of the match frame grouped by player and by game, built once
+# per data version. Filtering by player or game is a slice of these arrays,
+# so its cost follows the size of the result, not of the whole match table.
+
+
+class MatchIndex:
+    # With `previous`, the first rows of df are the ones `previous` indexes:
+    # its codes are remapped and only the remaining rows are sorted and merged
+    # in, so appending rows costs about a copy of the arrays, not a re-sort.
+
+    def __init__(self, df, previous=None):
+        if previous is None:
+            nick_codes, nicks = pd.factorize(df['nick'], sort=True)
+            game_codes, games = pd.factorize(df['game_id'], sort=True)
+            self.players = nicks.tolist()
+            self.games = games.tolist()
+            self.nick_codes = nick_codes
+            self.game_codes = game_codes
+            by_player = np.lexsort((game_codes, nick_codes))
+            by_game = np.argsort(game_codes, kind='stable')
+        else:
+            start = len(previous.nick_codes)
+            new = df.iloc[start:]
+            self.players = sorted(set(previous.players).union(new['nick'].tolist()))
+            previous_games = np.asarray(previous.games, dtype=np.int64)
+            games = np.union1d(previous_games, new['game_id'].to_numpy())
+            self.games = games.tolist()
+
+            # Both lists stay sorted, so remapped codes keep the previous orders valid
+            players = pd.Index(self.players)
+            player_map = players.get_indexer(previous.players)
+            new_nicks = players.get_indexer(new['nick'])
+            game_map = np.searchsorted(games, previous_games)
+            new_games = np.searchsorted(games, new['game_id'].to_numpy())
+            self.nick_codes = np.concatenate([player_map[previous.nick_codes], new_nicks])
+            self.game_codes = np.concatenate([game_map[previous.game_codes], new_games])
+
+            # New rows go after the previous rows with the same key, as in a stable sort
+            new_rows = np.arange(start, len(df))
+            key = self.nick_codes.astype(np.int64) * len(self.games) + self.game_codes
+            order = new_rows[np.argsort(key[new_rows], kind='stable')]
+            by_player = np.insert(previous._by_player, np.searchsorted(key[previous._by_player], key[order], side='right'), order)
+            order = new_rows[np.argsort(new_games, kind='stable')]
+            by_game = np.insert(previous._by_game, np.searchsorted(self.game_codes[previous._by_game], self.game_codes[order], side='right'), order)
+
+        self._player_pos = {nick: i for i, nick in enumerate(self.players)}
+        self._game_pos = {game_id: i for i, game_id in enumerate(self.games)}
+
+        # Rows sorted by (nick, game_id), with the start of each player's block
+        self._by_player = by_player
+        self._player_bounds = np.searchsorted(self.nick_codes[self._by_player], np.arange(len(self.players) + 1))
+
+        # Rows sorted by game_id, with the start of each game's block
+        self._by_game = by_game
+        self._game_bounds = np.searchsorted(self.game_codes[self._by_game], np.arange(len(self.games) + 1))
+
+    def _player_block(self, i):
+        return self._by_player[self._player_bounds[i]:self._player_bounds[i + 1]]
+
+    def player_games(self, nick):
+        # Sorted game list of the player; the block is already ordered by game
+        i = self._player_pos.get(nick)
+        if i is None:
+            return []
+        codes = self.game_codes[self._player_block(i)]
+        return [self.games[code] for code in codes[np.r_[True, codes[1:] != codes[:-1]]]]
+
+    def player_rows(self, nick, games=None):
+        i = self._player_pos.get(nick)
+        if i is None:
+            return np.empty(0, dtype=np.intp)
+        rows = self._player_block(i)
+        if games is not None:
+            # The block is ordered by game, so each game is a contiguous run
+            codes = np.sort([self._game_pos[game_id] for game_id in games if game_id in self._game_pos])
+            block_games = self.game_codes[rows]
+            starts = np.searchsorted(block_games, codes, side='left')
+            ends = np.searchsorted(block_games, codes, side='right')
+            rows = np.concatenate([rows[start:end] for start, end in zip(starts, ends)] or [rows[:0]])
+        # Back in table order
+        return np.sort(rows)
+
+    def game_rows(self, games):
+        blocks = []
+        for game_id in games:
+            i = self._game_pos.get(game_id)
+            if i is not None:
+                blocks.append(self._by_game[self._game_bounds[i]:self._game_bounds[i + 1]])
+        if not blocks:
+            return np.empty(0, dtype=np.intp)
+        return np.sort(np.concatenate(blocks))
+
+    def players_in(self, rows):
+        return [self.players[code] for code in np.unique(self.nick_codes[rows])]
+
+    def keep_players(self, rows, nicks):
+        codes = [self._player_pos[nick] for nick in nicks if nick in self._player_pos]
+        return rows[np.isin(self.nick_codes[rows], codes)]
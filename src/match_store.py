@@ -0,0 +1,146 @@
+import os
+import time
+import uuid
+import hashlib
+import pandas as pd
+from src.schema import MATCH_DTYPES
+from src.paths import DATA_DIR
+from src.partitions import in_window, path_month, split_by_month, window_bounds
+
+# Matches ingested by loader/app_matches.py. Every ingest writes new Parquet
+# partitions holding only games that were not stored yet, one per month of
+# `updated_at` (part-<time>-<id>-2025-01.parquet); existing partitions are
+# never rewritten. Partitions written before the month split have no month
+# in their name and are filtered by date when read for a month window.
+STORE_DIR = os.path.join(DATA_DIR, 'match_store')
+
+KEY = ['game_id', 'nick']
+
+
+def partition_paths(window=None):
+    # Partitions that can hold rows of `window`, in name (= ingest) order
+    if not os.path.isdir(STORE_DIR):
+        return []
+    return sorted(
+        os.path.join(STORE_DIR, name)
+        for name in os.listdir(STORE_DIR)
+        if name.startswith('part-') and name.endswith('.parquet')
+        and (path_month(name) is None or in_window(path_month(name), window))
+    )
+
+
+def history_paths(window):
+    # Partitions that can hold matches from before `window` (or undated ones),
+    # which the form of its players continues from
+    if window is None:
+        return []
+    return [path for path in partition_paths() if path_month(path) is None or path_month(path) < window[0]]
+
+
+def store_months():
+    return sorted({path_month(path) for path in partition_paths()} - {None})
+
+
+def store_fingerprint():
+    # Partitions are immutable, so their names identify the store contents
+    names = '|'.join(os.path.basename(path) for path in partition_paths())
+    return hashlib.sha1(names.encode()).hexdigest()
+
+
+# Keys of every partition this process has read or written, by path. Partitions
+# are immutable, so each one is read once per run and a loader run checks its
+# batches against keys it already holds; only partitions written since by
+# another process are read.
+_keys = {}
+_games = set()
+
+
+def add_keys(path, keys):
+    _keys[path] = keys
+    _games.update(keys['game_id'].tolist())
+
+
+def load_keys():
+    paths = partition_paths()
+    if set(_keys) - set(paths):
+        # Partitions were removed, the store was reset
+        _keys.clear()
+        _games.clear()
+    for path in paths:
+        if path not in _keys:
+            # Only the key columns are read, not the stats
+            add_keys(path, pd.read_parquet(path, columns=KEY))
+    return paths
+
+
+def stored_keys():
+    paths = load_keys()
+    if not paths:
+        return pd.DataFrame({'game_id': pd.Series(dtype='int'), 'nick': pd.Series(dtype='string')})
+    return pd.concat([_keys[path] for path in paths], ignore_index=True)
+
+
+def stored_game_ids():
+    load_keys()
+    return set(_games)
+
+
+def append_matches(df):
+    # Keep only (game_id, nick) rows that are not in the store yet
+    df = df.astype(MATCH_DTYPES)
+    df = df.drop_duplicates(subset=KEY)
+    load_keys()
+    # Rows of games that are not stored are new; only rows of stored games
+    # are checked against the stored keys of those games
+    known = df['game_id'].isin(_games)
+    if known.any():
+        games = df.loc[known, 'game_id'].unique()
+        stored = pd.concat([keys[keys['game_id'].isin(games)] for keys in _keys.values()], ignore_index=True)
+        seen = pd.MultiIndex.from_frame(stored)
+        df = df[~pd.MultiIndex.from_frame(df[KEY]).isin(seen)]
+    if df.empty:
+        return None
+
+    os.makedirs(STORE_DIR, exist_ok=True)
+    prefix = f'part-{int(time.time() * 1000)}-{uuid.uuid4().hex[:8]}'
+    paths = []
+    for month, rows in split_by_month(df, 'updated_at'):
+        path = os.path.join(STORE_DIR, f'{prefix}-{month}.parquet' if month else f'{prefix}.parquet')
+
+        # Readers only list finished partitions, the temp file is renamed into place
+        tmp = path + '.tmp'
+        rows.to_parquet(tmp, index=False)
+        os.replace(tmp, path)
+        add_keys(path, rows[KEY].reset_index(drop=True))
+        paths.append(path)
+    return paths
+
+
+def read_partition(path, window=None, columns=None):
+    # A partition without a month in its name is filtered while it is read:
+    # row groups whose updated_at range is outside the window are skipped
+    if window is None or path_month(path) is not None:
+        return pd.read_parquet(path, columns=columns)
+    start, end = window_bounds(window)
+    return pd.read_parquet(path, columns=columns, filters=[('updated_at', '>=', start), ('updated_at', '<', end)])
+
+
+def read_undated(columns=None):
+    # Rows without a date, only partitions without a month in their name hold them
+    paths = [path for path in partition_paths() if path_month(path) is None]
+    if not paths:
+        return None
+    parts = [pd.read_parquet(path, columns=columns) for path in paths]
+    df = pd.concat([part[part['updated_at'].isna()] for part in parts], ignore_index=True)
+    return df.drop_duplicates(subset=KEY)
+
+
+def read_store(paths=None, window=None, columns=None):
+    # Rows of `window` in every partition, or only in `paths` when the caller
+    # already has the others
+    if paths is None:
+        paths = partition_paths(window)
+    if not paths:
+        return None
+    df = pd.concat([read_partition(path, window, columns) for path in paths], ignore_index=True)
+    return df.drop_duplicates(subset=KEY)
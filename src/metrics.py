@@ -0,0 +1,167 @@
+import numpy as np
+import pandas as pd
+from src.schema import widen_floats
+
+# Derived metrics are declared here instead of being materialized at load
+# time. A metric lists its input columns (base or derived) and a vectorized
+# formula over them; it is only computed the first time it is asked for.
+# `sql` is the same formula as a DuckDB expression for src/sql_backend.py,
+# where round2 and nan_to_zero are macros matching numpy's rounding and fillna.
+
+
+# Means are taken from exact sums: every value is scaled to a whole number of
+# MEAN_SCALE units first, so the total is the same in whatever order rows are
+# added. pandas and DuckDB (scaled() macro) then give the same mean, also
+# where it lands on a rounding boundary.
+MEAN_SCALE = 10 ** 6
+
+
+def scaled(df):
+    # NaN stays NaN and is left out of the sums and counts
+    return (df.astype('float64') * MEAN_SCALE).round()
+
+
+def mean_of(total, n):
+    # Mean from a sum of scaled values and the number of values in it
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return total / n / MEAN_SCALE
+
+
+class DerivedMetric:
+
+    def __init__(self, inputs, formula, sql):
+        self.inputs = inputs
+        self.formula = formula
+        self.sql = sql
+
+
+class GroupTotal:
+    # Sum of `column` over all rows sharing the same `by` value. Every total
+    # with the same `by` is computed together in one multi-column groupby.
+
+    def __init__(self, by, column):
+        self.by = by
+        self.column = column
+
+    @property
+    def sql(self):
+        return f'CAST(sum({self.column}) OVER (PARTITION BY {self.by}) AS BIGINT)'
+
+
+class MetricFrame:
+    # Base frame plus memoized derived columns. The base frame is never
+    # modified, so one instance can be shared between sessions.
+
+    def __init__(self, df, registry):
+        self.df = df
+        self.registry = registry
+        self._computed = {}
+        self._ranks = {}
+
+    def __contains__(self, name):
+        return name in self.df.columns or name in self.registry
+
+    def get(self, name):
+        if name in self.df.columns:
+            return self.df[name]
+        if name not in self._computed:
+            metric = self.registry[name]
+            if isinstance(metric, GroupTotal):
+                self._compute_totals(metric.by)
+            else:
+                inputs = [self.get(column) for column in metric.inputs]
+                self._computed[name] = metric.formula(*inputs).rename(name)
+        return self._computed[name]
+
+    def _compute_totals(self, by):
+        totals = {
+            name: metric.column
+            for name, metric in self.registry.items()
+            if isinstance(metric, GroupTotal) and metric.by == by
+        }
+        columns = list(dict.fromkeys(totals.values()))
+        sums = self.df.groupby(by)[columns].transform('sum')
+        for name, column in totals.items():
+            self._computed[name] = sums[column].rename(name)
+
+    def carry_over(self, previous, rows):
+        # Takes the memoized columns of `previous`, whose table is the first
+        # rows of this one, recomputing only the row positions `rows`. These
+        # must include every appended row and every other row of the groups
+        # that got new rows, so group totals over them are complete.
+        if not previous._computed:
+            return
+        part = MetricFrame(self.df.take(rows), self.registry)
+        n = len(previous.df)
+        # Sessions may still be filling previous._computed, it is copied first
+        for name, old in list(previous._computed.items()):
+            new = part.get(name)
+            values = np.empty(len(self.df), dtype=np.result_type(old.dtype, new.dtype))
+            values[:n] = old.to_numpy()
+            values[rows] = new.to_numpy()
+            self._computed[name] = pd.Series(values, index=self.df.index, name=name)
+
+    def frame(self, columns, rows=None):
+        # Requested columns side by side, optionally restricted to row positions `rows`
+        df = pd.DataFrame({column: self.get(column) for column in columns}, copy=False)
+        if rows is not None:
+            df = df.take(rows)
+        return df
+
+    def rank(self, columns):
+        # Position of every row in the table sorted by `columns`, computed once
+        # per column set; sorting any subset of rows is then an argsort of its ranks
+        key = tuple(columns)
+        if key not in self._ranks:
+            ordered = self.frame(key).reset_index(drop=True).sort_values(list(key), kind='stable')
+            rank = np.empty(len(ordered), dtype=np.intp)
+            rank[ordered.index.to_numpy()] = np.arange(len(ordered))
+            self._ranks[key] = rank
+        return self._ranks[key]
+
+    def sorted_rows(self, rows, columns, descending=False, start=0, stop=None):
+        # `rows` ordered by `columns` (ties by table position), sliced to [start, stop)
+        rank = self.rank(columns)[rows]
+        order = np.argsort(-rank if descending else rank, kind='stable')
+        return rows[order[start:stop]]
+
+    def summary(self, columns, rows=None):
+        # Average/Minimum/Maximum of each column, one row per column
+        df = widen_floats(self.frame(columns, rows))
+        values = scaled(df)
+        return pd.DataFrame({'Average': mean_of(values.sum(), values.count()), 'Minimum': df.min(), 'Maximum': df.max()})
+
+
+def per_map(column):
+    return DerivedMetric(
+        [column, 'matches'],
+        lambda value, matches: (value / matches).round(2).fillna(0),
+        f'nan_to_zero(round2({column} / matches))'
+    )
+
+
+def share(column, total):
+    return DerivedMetric(
+        [column, total],
+        lambda value, total: (value / total * 100).round(2),
+        f'round2({column} / {total} * 100)'
+    )
+
+
+PLAYER_METRICS = {
+    'killsPerMap': per_map('matou'),
+    'deatchsPerMap': per_map('morreu'),
+    'firstKillsPerMap': per_map('firstkills'),
+    'bombPlantedPerMap': per_map('bomb_planted'),
+    'bombDefusedPerMap': per_map('bomb_defused'),
+}
+
+MATCH_METRICS = {
+    'total_damage_match': GroupTotal('game_id', 'damage'),
+    'total_kills_match': GroupTotal('game_id', 'nb_kill'),
+    'total_hits_match': GroupTotal('game_id', 'hits'),
+    'damage_share': share('damage', 'total_damage_match'),
+    'kills_share': share('nb_kill', 'total_kills_match'),
+    'hits_share': share('hits', 'total_hits_match'),
+    'damage_hits': DerivedMetric(['damage', 'hits'], lambda damage, hits: (damage / hits).round(2), 'round2(damage / hits)'),
+}
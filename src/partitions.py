@@ -0,0 +1,57 @@
+import re
+import numpy as np
+import pandas as pd
+
+# Month partitioning of the player and match data. Snapshots and match store
+# partitions hold the rows of one month each ('2025-01', from `mes` or
+# `updated_at`), so a month window only reads the files of its months.
+# A window is a (first, last) pair of months, both included; None is the
+# whole history.
+
+MONTH = re.compile(r'(\d{4}-\d{2})\.parquet$')
+
+
+def month_keys(series):
+    # 'YYYY-MM' of every value, None where the date is missing
+    months = series.to_numpy(dtype='datetime64[ns]').astype('datetime64[M]')
+    return pd.Series(np.datetime_as_string(months, unit='M'), index=series.index).where(~np.isnat(months), None)
+
+
+def split_by_month(df, column):
+    # (month, rows) pairs in month order, rows keep their table order
+    keys = month_keys(df[column])
+    for month, rows in df.groupby(keys, sort=True, dropna=False):
+        yield (None if pd.isna(month) else month), rows
+
+
+def window_rows(df, column, window=None):
+    # Rows of the months in `window`, in the order the month partitions hold
+    # them: by month, rows without a date last (whole history only)
+    parts = [rows for month, rows in split_by_month(df, column) if in_window(month, window)]
+    return pd.concat(parts, ignore_index=True) if parts else df.iloc[:0]
+
+
+def path_month(path):
+    # Month a partition file is named after, None for files without one
+    match = MONTH.search(path)
+    return match.group(1) if match else None
+
+
+def in_window(month, window):
+    if window is None:
+        return True
+    return month is not None and window[0] <= month <= window[1]
+
+
+def window_bounds(window):
+    # [start, end) timestamps of the window, for filtering rows by date
+    first, last = window
+    return pd.Timestamp(first), pd.Timestamp(last) + pd.offsets.MonthBegin(1)
+
+
+def last_months(months, n):
+    # Window over the last n of the given months
+    months = sorted(months)
+    if not months:
+        return None
+    return months[max(0, len(months) - n)], months[-1]
@@ -0,0 +1,5 @@
+import os
+
+# Workbooks, snapshots and the match store live under src/ unless GC_DATA_DIR
+# points the dashboard at another directory (e.g. generated benchmark data)
+DATA_DIR = os.environ.get('GC_DATA_DIR', 'src')
@@ -0,0 +1,140 @@
+import numpy as np
+import pandas as pd
+
+# Target dtypes for the player-month and per-match frames
+
+PLAYER_DTYPES = {
+    'mes': 'datetime64[ns]', 
+    'id': 'int', 
+    'nome': 'string', 
+    'kdr': 'float64', 
+    'adr': 'float64', 
+    'matou': 'int', 
+    'morreu': 'int', 
+    'multikills': 'int', 
+    'firstkills': 'int', 
+    'headshotrate': 'float', 
+    'bomb_planted': 'int', 
+    'bomb_defused': 'int', 
+    'matches': 'int'
+}
+
+MATCH_DTYPES = {
+    'game_id': 'int', 
+    'nick': 'string', 
+    'team': 'string', 
+    'updated_at': 'datetime64[ns]', 
+    'map_name': 'string', 
+    'player_room': 'string', 
+    'nb_kill': 'int', 
+    'assist': 'int', 
+    'death': 'int', 
+    'hs': 'int', 
+    'damage': 'int', 
+    'adr': 'float', 
+    'kdr': 'float',
+    'phs': 'float',
+    'firstkill': 'int',
+    'pkast': 'float',
+    'nb1kill': 'int',
+    'nb2kill': 'int',
+    'nb3kill': 'int',
+    'nb4kill': 'int',
+    'nb5kill': 'int',
+    'defuse': 'int',
+    'bombe': 'int',
+    'hits': 'int',
+    'level': 'int',
+    'rating': 'int',
+    'flash_assist': 'int',
+    'multikills': 'int',
+}
+
+
+def smallest_int(series):
+    low, high = series.min(), series.max()
+    for dtype in ('int8', 'int16', 'int32'):
+        info = np.iinfo(dtype)
+        if info.min <= low and high <= info.max:
+            return dtype
+    return 'int64'
+
+
+def fits_float32(series):
+    # Stats carry two decimals; float32 keeps them exactly at that precision
+    values = series.to_numpy()
+    narrow = values.astype('float32').astype('float64')
+    return (
+        np.array_equal(np.round(values, 2), values, equal_nan=True)
+        and np.array_equal(np.round(narrow, 2), values, equal_nan=True)
+    )
+
+
+def compact_frame(df):
+    # Smallest dtypes that hold the current values: downcast integers,
+    # float32 where it keeps the two decimals, category for repeated strings
+    dtypes = {}
+    for column in df.columns:
+        series = df[column]
+        if series.empty:
+            continue
+        if pd.api.types.is_integer_dtype(series.dtype):
+            dtypes[column] = smallest_int(series)
+        elif series.dtype == 'float64' and fits_float32(series):
+            dtypes[column] = 'float32'
+        elif pd.api.types.is_string_dtype(series.dtype) and series.nunique() <= len(series) // 2:
+            dtypes[column] = 'category'
+    return df.astype(dtypes)
+
+
+def widen_floats(df):
+    # Undoes the float32 step of compact_frame before any arithmetic: float64
+    # with the two decimals restored exactly, so means round like the source data
+    columns = [column for column, dtype in df.dtypes.items() if dtype == 'float32']
+    if not columns:
+        return df
+    df = df.astype({column: 'float64' for column in columns})
+    return df.round({column: 2 for column in columns})
+
+
+def append_rows(df, rows):
+    # `rows` appended to a compact_frame result. Columns keep their dtype
+    # unless the new values need a wider one (or new categories)
+    if rows.empty:
+        return df
+    rows = widen_floats(rows[df.columns])
+    dtypes = {}
+    for column, dtype in df.dtypes.items():
+        series = rows[column]
+        if isinstance(dtype, pd.CategoricalDtype):
+            # Kept sorted like astype('category') does, sorting by the column follows the codes
+            new = pd.Index(series.dropna().unique()).difference(dtype.categories)
+            dtypes[column] = pd.CategoricalDtype(dtype.categories.append(new).sort_values()) if len(new) else dtype
+        elif pd.api.types.is_integer_dtype(dtype):
+            dtypes[column] = np.promote_types(dtype, smallest_int(series))
+        elif dtype == 'float32' and not fits_float32(series):
+            dtypes[column] = 'float64'
+        else:
+            dtypes[column] = dtype
+    # float32 columns that had to widen get their two decimals back, as in widen_floats
+    widened = {column: 2 for column, dtype in df.dtypes.items() if dtype == 'float32' and dtypes[column] == 'float64'}
+    df = df.astype(dtypes)
+    if widened:
+        df = df.round(widened)
+    return pd.concat([df, rows.astype(dtypes)], ignore_index=True)
+
+
+def row_hashes(df):
+    # One hash per row, equal for equal values whatever dtypes compact_frame
+    # picked, so two versions of a table can be diffed row by row
+    ints = [column for column, dtype in df.dtypes.items() if pd.api.types.is_integer_dtype(dtype)]
+    df = widen_floats(df).astype({column: 'int64' for column in ints})
+    return pd.util.hash_pandas_object(df, index=False)
+
+
+def memory_report(df):
+    # Resident bytes per column, strings and categories included
+    usage = df.memory_usage(deep=True, index=False)
+    report = pd.DataFrame({'dtype': df.dtypes.astype(str), 'bytes': usage})
+    report.loc['total'] = ['', usage.sum()]
+    return report
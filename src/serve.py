@@ -0,0 +1,27 @@
+import sys
+import time
+from src.warmup import warm
+
+# Starts the dashboard with its data already loaded: the shared datasets are
+# warmed in this process, then Streamlit runs main.py in the same process and
+# reuses them. Until warm() returns the port is closed, so a health check only
+# passes once the first visitor can be served from memory.
+#
+#   python -m src.serve [streamlit run options, e.g. --server.port 8080]
+
+
+def main():
+    start = time.perf_counter()
+    if warm():
+        print(f"Data warmed in {time.perf_counter() - start:.1f}s")
+    else:
+        # The dashboard still starts and retries the load on the first rerun
+        print("Warm-up failed, starting without preloaded data")
+
+    from streamlit.web import cli
+    sys.argv = ['streamlit', 'run', 'main.py', *sys.argv[1:]]
+    sys.exit(cli.main())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+import os
+import json
+import uuid
+import shutil
+import hashlib
+import pandas as pd
+from src.instrument import count, stage
+from src.paths import DATA_DIR
+from src.partitions import in_window, path_month, split_by_month, window_rows
+
+# Columnar copies of the workbooks live next to them, already typed, so a
+# dashboard load never goes through openpyxl. A snapshot is a directory with
+# one Parquet file per month (see src/partitions.py), so loading a month
+# window only reads the files of those months.
+SNAPSHOT_DIR = os.path.join(DATA_DIR, '.snapshots')
+
+# Bump when the build functions change what ends up in a snapshot
+SNAPSHOT_VERSION = 4
+
+# Rows without a date, only part of the whole-history window
+UNDATED = 'none.parquet'
+
+# Zero rows with the snapshot's columns and dtypes, read when no month is in the window
+SCHEMA = 'schema.parquet'
+
+
+def fingerprint(path):
+    # Size + mtime changes whenever the workbook is saved again
+    stat = os.stat(path)
+    return f'{stat.st_size}-{stat.st_mtime_ns}'
+
+
+def snapshot_paths(name):
+    # Directory of every version of the snapshot, and the metadata naming the current one
+    data_dir = os.path.join(SNAPSHOT_DIR, name)
+    meta_path = os.path.join(SNAPSHOT_DIR, f'{name}.json')
+    return data_dir, meta_path
+
+
+def read_meta(meta_path):
+    try:
+        with open(meta_path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def current_dir(source, name):
+    # Directory of the snapshot built from the current workbook, None if there is none
+    data_dir, meta_path = snapshot_paths(name)
+    meta = read_meta(meta_path)
+    if meta is None:
+        return None
+    version = {key: meta.get(key) for key in ('source', 'fingerprint', 'version')}
+    if version != {'source': source, 'fingerprint': fingerprint(source), 'version': SNAPSHOT_VERSION}:
+        return None
+    path = os.path.join(data_dir, meta['dir'])
+    return path if os.path.isdir(path) else None
+
+
+def write_snapshot(df, source, name, by):
+    # One file per month of the `by` column. A new version is written to its
+    # own directory, then the metadata is switched to it, so readers never
+    # see half a snapshot; older versions are removed afterwards.
+    data_dir, meta_path = snapshot_paths(name)
+    version = fingerprint(source)
+    digest = hashlib.sha1(f'{source}|{version}|{SNAPSHOT_VERSION}'.encode()).hexdigest()[:16]
+    path = os.path.join(data_dir, digest)
+
+    tmp = os.path.join(data_dir, f'.{digest}-{uuid.uuid4().hex[:8]}.tmp')
+    os.makedirs(tmp)
+    df.iloc[:0].to_parquet(os.path.join(tmp, SCHEMA), index=False)
+    for month, rows in split_by_month(df, by):
+        rows.to_parquet(os.path.join(tmp, f'{month}.parquet' if month else UNDATED), index=False)
+    try:
+        os.rename(tmp, path)
+    except OSError:
+        # Another process wrote the same version first
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    meta = {'source': source, 'fingerprint': version, 'version': SNAPSHOT_VERSION, 'dir': digest}
+    tmp_meta = meta_path + '.tmp'
+    with open(tmp_meta, 'w') as f:
+        json.dump(meta, f)
+    os.replace(tmp_meta, meta_path)
+
+    for old in os.listdir(data_dir):
+        if old != digest and not old.startswith('.'):
+            shutil.rmtree(os.path.join(data_dir, old), ignore_errors=True)
+    return path
+
+
+def month_files(path, window=None, undated=False):
+    # Files of the months in `window`, in month order, or only the file of
+    # the rows without a date; the schema file when there are none
+    names = sorted(name for name in os.listdir(path) if path_month(name) is not None)
+    files = [] if undated else [os.path.join(path, name) for name in names if in_window(path_month(name), window)]
+    if (window is None or undated) and os.path.exists(os.path.join(path, UNDATED)):
+        files.append(os.path.join(path, UNDATED))
+    return files or [os.path.join(path, SCHEMA)]
+
+
+def snapshot_months(path):
+    return sorted(path_month(name) for name in os.listdir(path) if path_month(name) is not None)
+
+
+def latest_dir(name):
+    # Directory of the last snapshot written, whether or not its workbook changed since
+    data_dir, meta_path = snapshot_paths(name)
+    meta = read_meta(meta_path)
+    if meta is None or meta.get('version') != SNAPSHOT_VERSION:
+        return None
+    path = os.path.join(data_dir, meta['dir'])
+    return path if os.path.isdir(path) else None
+
+
+def ensure_snapshot(source, name, build, by):
+    # Directory of an up-to-date snapshot, built from the workbook when missing
+    path = current_dir(source, name)
+    if path is not None:
+        count(f'snapshot.{name}.hit')
+        return path
+
+    count(f'snapshot.{name}.miss')
+    with stage(f'read_excel.{name}'):
+        df = build(source)
+    return write_snapshot(df, source, name, by)
+
+
+def load_snapshot(source, name, build, by, window=None, columns=None, undated=False):
+    # Rows of the months in `window`, or only the rows without a date (only
+    # `columns` when given), read from the snapshot if it still matches the
+    # workbook; otherwise the snapshot is rebuilt first
+    path = current_dir(source, name)
+    if path is not None:
+        count(f'snapshot.{name}.hit')
+    else:
+        count(f'snapshot.{name}.miss')
+        with stage(f'read_excel.{name}'):
+            df = build(source)
+        try:
+            path = write_snapshot(df, source, name, by)
+        except OSError as e:
+            # A read-only checkout still works, it just parses the workbook every time
+            print(f"Could not write snapshot {name}: {str(e)}")
+            df = df[df[by].isna()].reset_index(drop=True) if undated else window_rows(df, by, window)
+            return df[columns] if columns is not None else df
+
+    with stage(f'read_parquet.{name}'):
+        return pd.concat([pd.read_parquet(file, columns=columns) for file in month_files(path, window, undated)], ignore_index=True)
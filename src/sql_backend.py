@@ -0,0 +1,375 @@
+import os
+import glob
+import hashlib
+import threading
+from functools import partial
+import numpy as np
+import pandas as pd
+from src.data_read import DATA_FILE, data_fingerprint, read_workbook as read_player_workbook
+from src.match_data import MATCH_FILE, match_fingerprint, read_workbook as read_match_workbook
+from src.form_lead import get_form_lead
+from src.match_store import partition_paths
+from src.metrics import MATCH_METRICS, MEAN_SCALE, PLAYER_METRICS, GroupTotal, mean_of
+from src.form import FORM_METRICS, PlayerForm
+from src.snapshot import SNAPSHOT_DIR, SNAPSHOT_VERSION, ensure_snapshot, month_files
+from src.partitions import window_bounds
+from src.instrument import count, stage
+
+# Optional DuckDB backend (GC_BACKEND=duckdb). The Parquet snapshots and the
+# match store are loaded into an on-disk DuckDB database with every derived
+# metric materialized; filters, sorting, paging, the month x player means and
+# the summary stats run as queries, so only result-sized frames reach pandas.
+# It exposes the same methods main.py uses on PlayerData and MatchData.
+
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+# Bump when the tables built here change
+DATABASE_VERSION = 3
+
+# Same results as numpy's round(2) (half to even) and pandas' fillna(0)
+MACROS = [
+    "CREATE TEMP MACRO round2(x) AS round_even(x * 100, 0) / 100",
+    "CREATE TEMP MACRO nan_to_zero(x) AS CASE WHEN isnan(x) THEN 0 ELSE x END",
+]
+
+
+def require_duckdb():
+    if duckdb is None:
+        raise ImportError("GC_BACKEND=duckdb needs the duckdb package (pip install duckdb)")
+
+
+def quote(path):
+    return "'" + path.replace("'", "''") + "'"
+
+
+def database_path(name, fingerprint, window=None):
+    # One file per data version and month window: DuckDB shares open databases
+    # by path, so a rebuilt database must not reuse the name of one that may still be open
+    label = 'all' if window is None else f'{window[0]}_{window[1]}'
+    digest = hashlib.sha1(f'{fingerprint}|{SNAPSHOT_VERSION}|{DATABASE_VERSION}'.encode()).hexdigest()[:16]
+    return os.path.join(SNAPSHOT_DIR, f'{name}@{label}-{digest}.duckdb')
+
+
+def number(column):
+    # NaN as NULL, skipped by aggregates like pandas does
+    return f"nullif(CAST({column} AS DOUBLE), 'NaN'::DOUBLE)"
+
+
+def scaled(column):
+    # Same values as metrics.scaled(); the macros above only exist while a database is built
+    return f"round_even({number(column)} * {MEAN_SCALE}, 0)"
+
+
+def file_list(paths):
+    return '[' + ', '.join(quote(path) for path in paths) + ']'
+
+
+def metric_columns(registry):
+    # Group totals are window sums, computed one level below the ratios using them
+    totals = [f'{metric.sql} AS {name}' for name, metric in registry.items() if isinstance(metric, GroupTotal)]
+    derived = [f'{metric.sql} AS {name}' for name, metric in registry.items() if not isinstance(metric, GroupTotal)]
+    return totals, derived
+
+
+def build_database(path, statements, finish=None):
+    # Built under a temp name and renamed into place, then older versions are removed
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    tmp = path + '.tmp'
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    con = duckdb.connect(tmp)
+    try:
+        for statement in MACROS + statements:
+            con.execute(statement)
+        if finish is not None:
+            finish(con)
+    finally:
+        con.close()
+    os.replace(tmp, path)
+
+    prefix = path.rsplit('-', 1)[0]
+    for old in glob.glob(prefix + '-*.duckdb'):
+        if old != path:
+            remove_database(old)
+
+
+def remove_database(path):
+    try:
+        os.remove(path)
+    except OSError:
+        # Still open elsewhere (Windows), the next build removes it
+        pass
+
+
+def player_statements(window=None):
+    # Only the snapshot files of the months in the window are scanned
+    source = month_files(ensure_snapshot(DATA_FILE, 'players', read_player_workbook, 'mes'), window)
+    _, derived = metric_columns(PLAYER_METRICS)
+    return [f"CREATE TABLE players AS SELECT *, {', '.join(derived)} FROM read_parquet({file_list(source)})"]
+
+
+def match_statements(window=None):
+    source = month_files(ensure_snapshot(MATCH_FILE, 'matches', read_match_workbook, 'updated_at'), window)
+    parts = partition_paths(window)
+    totals, derived = metric_columns(MATCH_METRICS)
+
+    # Workbook rows first (month files in order), then the store partitions
+    # in name order, like get_match()
+    union = (
+        f"SELECT * EXCLUDE (filename, file_row_number), 0 AS part, filename AS file, file_row_number AS pos"
+        f" FROM read_parquet({file_list(source)}, filename=true, file_row_number=true)"
+    )
+    unique = "SELECT * FROM source"
+    if parts:
+        # Partitions without a month in their name are filtered by date,
+        # DuckDB skips their row groups outside the window
+        where = ''
+        if window is not None:
+            start, end = window_bounds(window)
+            where = f" WHERE updated_at >= TIMESTAMP '{start}' AND updated_at < TIMESTAMP '{end}'"
+        union += (
+            f" UNION ALL BY NAME SELECT * EXCLUDE (filename, file_row_number), 1 AS part, filename AS file,"
+            f" file_row_number AS pos FROM read_parquet({file_list(parts)}, filename=true, file_row_number=true){where}"
+        )
+        # First occurrence of each (game_id, nick) wins
+        unique += " QUALIFY row_number() OVER (PARTITION BY game_id, nick ORDER BY part, file, pos) = 1"
+
+    return [f"""
+        CREATE TABLE matches AS
+        WITH source AS ({union}),
+        unique_rows AS ({unique}),
+        numbered AS (
+            SELECT * EXCLUDE (part, file, pos),
+                   row_number() OVER (ORDER BY part, file, pos) - 1 AS row_id
+            FROM unique_rows
+        ),
+        with_totals AS (SELECT *, {', '.join(totals)} FROM numbered)
+        SELECT *, {', '.join(derived)} FROM with_totals ORDER BY row_id
+    """]
+
+
+def add_form_columns(con, window=None):
+    # The EWMA is a recurrence with no SQL window equivalent, so the form
+    # metrics are computed by src/form.py on the built table and joined back,
+    # continuing from the players' matches before the window
+    stats = sorted({metric.column for metric in FORM_METRICS.values()})
+    df = con.execute(f"SELECT row_id, nick, updated_at, {', '.join(stats)} FROM matches ORDER BY row_id").df()
+    form = PlayerForm(df, lead=get_form_lead(window))
+    columns = pd.DataFrame({'row_id': df['row_id'], **{name: form.get(name) for name in FORM_METRICS}})
+    con.register('form_columns', columns)
+    con.execute("CREATE TABLE matches_form AS SELECT * FROM matches JOIN form_columns USING (row_id) ORDER BY row_id")
+    con.execute("DROP TABLE matches")
+    con.execute("ALTER TABLE matches_form RENAME TO matches")
+    con.unregister('form_columns')
+
+
+# Open connections by database path, in this process
+_open = {}
+_open_lock = threading.Lock()
+
+
+class Database:
+
+    def __init__(self, path):
+        self.path = path
+        self.con = duckdb.connect(path, read_only=True)
+        with _open_lock:
+            _open[path] = _open.get(path, 0) + 1
+
+    def close(self):
+        # The file goes with its last connection: a later load of the same
+        # data version builds it again
+        with _open_lock:
+            if self.con is None:
+                return
+            self.con.close()
+            self.con = None
+            _open[self.path] -= 1
+            if not _open[self.path]:
+                del _open[self.path]
+                remove_database(self.path)
+
+    def query(self, sql, params=None):
+        # A cursor per query: sessions run on different threads
+        with self.con.cursor() as cursor:
+            return cursor.execute(sql, params).df()
+
+    def values(self, sql, params=None):
+        return self.query(sql, params).iloc[:, 0].tolist()
+
+
+class SqlPlayerCube:
+    # Same interface as cube.PlayerCube, answered by aggregate queries
+
+    def __init__(self, db):
+        self.db = db
+        self.players = db.values("SELECT DISTINCT nome FROM players WHERE nome IS NOT NULL ORDER BY nome")
+
+    # Means are divided out by metrics.mean_of, like in cube.player_aggregates
+
+    def chart(self, metric, players):
+        df = self.db.query(
+            f"SELECT mes, nome, sum({scaled(metric)}) AS total, count({scaled(metric)}) AS n FROM players "
+            "WHERE nome IN (SELECT unnest(?::VARCHAR[])) GROUP BY mes, nome",
+            [list(players)]
+        )
+        df['value'] = mean_of(df['total'], df['n'])
+        return df.pivot(index='mes', columns='nome', values='value').dropna(how='all')
+
+    def stats(self, metric, players):
+        df = self.db.query(
+            f"SELECT nome, sum({scaled(metric)}) AS total, count({scaled(metric)}) AS n, "
+            f"min({metric}) AS Minimum, max({metric}) AS Maximum "
+            "FROM players WHERE nome IN (SELECT unnest(?::VARCHAR[])) GROUP BY nome ORDER BY nome",
+            [list(players)]
+        )
+        df.insert(1, 'Average', mean_of(df.pop('total'), df.pop('n')))
+        return df.set_index('nome').round(2)
+
+
+class SqlPlayerData:
+
+    def __init__(self, path):
+        self.db = Database(path)
+        self.cube = SqlPlayerCube(self.db)
+
+    def close(self):
+        self.db.close()
+
+
+def rows_param(rows):
+    return [np.asarray(rows, dtype='int64').tolist()]
+
+
+def as_rows(values):
+    return np.asarray(values, dtype=np.intp)
+
+
+class SqlMatchIndex:
+    # Same interface as match_index.MatchIndex, rows are positions in table order
+
+    def __init__(self, db):
+        self.db = db
+        self.players = db.values("SELECT DISTINCT nick FROM matches WHERE nick IS NOT NULL ORDER BY nick")
+        self.games = db.values("SELECT DISTINCT game_id FROM matches ORDER BY game_id")
+
+    def player_games(self, nick):
+        return self.db.values("SELECT DISTINCT game_id FROM matches WHERE nick = ? ORDER BY game_id", [nick])
+
+    def player_rows(self, nick, games=None):
+        if games is None:
+            return as_rows(self.db.values("SELECT row_id FROM matches WHERE nick = ? ORDER BY row_id", [nick]))
+        return as_rows(self.db.values(
+            "SELECT row_id FROM matches WHERE nick = ? AND game_id IN (SELECT unnest(?::BIGINT[])) ORDER BY row_id",
+            [nick, list(games)]
+        ))
+
+    def game_rows(self, games):
+        return as_rows(self.db.values(
+            "SELECT row_id FROM matches WHERE game_id IN (SELECT unnest(?::BIGINT[])) ORDER BY row_id",
+            [list(games)]
+        ))
+
+    def players_in(self, rows):
+        return self.db.values(
+            "SELECT DISTINCT nick FROM matches WHERE row_id IN (SELECT unnest(?::BIGINT[])) "
+            "AND nick IS NOT NULL ORDER BY nick",
+            rows_param(rows)
+        )
+
+    def keep_players(self, rows, nicks):
+        return as_rows(self.db.values(
+            "SELECT row_id FROM matches WHERE row_id IN (SELECT unnest(?::BIGINT[])) "
+            "AND nick IN (SELECT unnest(?::VARCHAR[])) ORDER BY row_id",
+            rows_param(rows) + [list(nicks)]
+        ))
+
+
+class SqlMatchData:
+    # Same interface as data_access.MatchData
+
+    def __init__(self, path):
+        self.db = Database(path)
+        self.lookup = SqlMatchIndex(self.db)
+
+    def close(self):
+        self.db.close()
+
+    def frame(self, columns, rows=None):
+        columns = list(columns)
+        select = ', '.join(['row_id'] + [column for column in columns if column != 'row_id'])
+        if rows is None:
+            df = self.db.query(f"SELECT {select} FROM matches ORDER BY row_id")
+            return df.set_index('row_id').rename_axis(None)[columns]
+        df = self.db.query(
+            f"SELECT {select} FROM matches WHERE row_id IN (SELECT unnest(?::BIGINT[]))",
+            rows_param(rows)
+        )
+        # Back in the order of `rows`, indexed by row position like MetricFrame.frame
+        return df.set_index('row_id').rename_axis(None).loc[np.asarray(rows), columns]
+
+    def sorted_rows(self, rows, columns, descending=False, start=0, stop=None):
+        # Matches MetricFrame.sorted_rows: nulls sort last, ties by table position,
+        # descending is the exact reverse
+        direction = 'DESC NULLS FIRST' if descending else 'ASC NULLS LAST'
+        order = ', '.join(f'{column} {direction}' for column in list(columns) + ['row_id'])
+        limit = f' LIMIT {int(stop) - int(start)}' if stop is not None else ''
+        return as_rows(self.db.values(
+            f"SELECT row_id FROM matches WHERE row_id IN (SELECT unnest(?::BIGINT[])) "
+            f"ORDER BY {order}{limit} OFFSET {int(start)}",
+            rows_param(rows)
+        ))
+
+    def summary(self, columns, rows=None):
+        # NaN is skipped like pandas does, not propagated like in SQL
+        columns = list(columns)
+        aggregates = []
+        for i, column in enumerate(columns):
+            aggregates += [
+                f'sum({scaled(column)}) AS t{i}', f'count({scaled(column)}) AS c{i}',
+                f'min({number(column)}) AS n{i}', f'max({number(column)}) AS x{i}',
+            ]
+        where = ' WHERE row_id IN (SELECT unnest(?::BIGINT[]))' if rows is not None else ''
+        result = self.db.query(
+            f"SELECT {', '.join(aggregates)} FROM matches{where}",
+            rows_param(rows) if rows is not None else None
+        ).iloc[0]
+
+        values = result.to_numpy(dtype='float64').reshape(len(columns), 4)
+        average = mean_of(values[:, 0], values[:, 1])
+        return pd.DataFrame({'Average': average, 'Minimum': values[:, 2], 'Maximum': values[:, 3]}, index=columns)
+
+
+def load_player_database(window=None):
+    require_duckdb()
+    try:
+        path = database_path('players', data_fingerprint(), window)
+        if os.path.exists(path):
+            count('database.players.hit')
+        else:
+            count('database.players.miss')
+            with stage('build_database.players'):
+                build_database(path, player_statements(window))
+        return SqlPlayerData(path)
+    except Exception as e:
+        print(f"Error loading data: {str(e)}")
+        return None
+
+
+def load_match_database(window=None):
+    require_duckdb()
+    try:
+        path = database_path('matches', match_fingerprint(), window)
+        if os.path.exists(path):
+            count('database.matches.hit')
+        else:
+            count('database.matches.miss')
+            with stage('build_database.matches'):
+                build_database(path, match_statements(window), partial(add_form_columns, window=window))
+        return SqlMatchData(path)
+    except Exception as e:
+        print(f"Error loading data: {str(e)}")
+        return None
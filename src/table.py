@@ -0,0 +1,46 @@
+import streamlit as st
+from src.instrument import stage
+
+# Match Details tables are sorted and paged on the server: only the rows of
+# the visible page are built, formatted and sent to the browser.
+
+PAGE_SIZES = [25, 50, 100, 250]
+
+
+def page_rows(frame, rows, sort_by, descending, page, page_size):
+    start = page * page_size
+    return frame.sorted_rows(rows, sort_by, descending, start, start + page_size)
+
+
+def paginated_table(frame, rows, columns, format_page, default_sort, descending=False, key='table'):
+    # columns: column -> display label. Sort options are the default sort
+    # (possibly several columns) followed by every single column.
+    sort_options = [tuple(default_sort)] + [(column,) for column in columns if (column,) != tuple(default_sort)]
+
+    left, middle, right = st.columns([3, 1, 1])
+    sort_by = left.selectbox(
+        "Sort by",
+        sort_options,
+        format_func=lambda option: ', '.join(columns[column] for column in option),
+        key=f"{key}_sort"
+    )
+    descending = middle.toggle("Descending", value=descending, key=f"{key}_desc")
+    page_size = right.selectbox("Rows per page", PAGE_SIZES, index=1, key=f"{key}_page_size")
+
+    pages = max(1, -(-len(rows) // page_size))
+    page = st.number_input("Page", min_value=1, max_value=pages, value=1, step=1, key=f"{key}_page")
+    page = min(page, pages) - 1
+
+    with stage('filter.page'):
+        visible = page_rows(frame, rows, sort_by, descending, page, page_size)
+
+    # Only the visible page is renamed and formatted
+    with stage('format.page'):
+        display_df = frame.frame(columns.keys(), visible)
+        display_df.columns = columns.values()
+        display_df = format_page(display_df)
+
+    with stage('render.table'):
+        st.dataframe(display_df, hide_index=True, use_container_width=True)
+    first = page * page_size + 1 if len(rows) else 0
+    st.caption(f"Rows {first}-{page * page_size + len(visible)} of {len(rows)}")
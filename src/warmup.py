@@ -0,0 +1,39 @@
+import sys
+from src.data_access import BACKEND, default_window, get_player_dataset, get_match_dataset
+from src.metrics import MATCH_METRICS
+from src.form import FORM_METRICS
+from src.instrument import stage
+
+# Loads both shared datasets of the default month window and computes what the
+# first session would otherwise pay for: snapshots (or DuckDB databases) are
+# written when missing, derived columns and the default table sorts are computed.
+#
+# At image build time `python -m src.warmup` leaves the snapshots in the image;
+# at server start src/serve.py calls warm() before Streamlit accepts connections.
+
+# Default sorts of the two Match Details tables in main.py
+DEFAULT_SORTS = [('updated_at',), ('game_id', 'team', 'nick')]
+
+
+def warm():
+    with stage('warmup'):
+        # The window a new session opens on
+        window = default_window()
+        player_data = get_player_dataset(window)
+        match_data = get_match_dataset(window)
+        if player_data is None or match_data is None:
+            return False
+
+        # Derived and form metrics are computed for the whole table on first use
+        rows = match_data.lookup.game_rows(match_data.lookup.games[:1])
+        match_data.frame(list(MATCH_METRICS) + list(FORM_METRICS), rows)
+        for sort in DEFAULT_SORTS:
+            match_data.sorted_rows(rows, sort)
+    return True
+
+
+if __name__ == "__main__":
+    if not warm():
+        print(f"Warm-up failed, the {BACKEND} datasets could not be loaded")
+        sys.exit(1)
+    print(f"Warm-up done ({BACKEND} backend)")
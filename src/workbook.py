@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+import openpyxl
+
+try:
+    from python_calamine import CalamineWorkbook
+except ImportError:
+    CalamineWorkbook = None
+
+# Typed reader for the legacy workbooks. Rows of the first sheet are streamed
+# (python-calamine when installed, read-only openpyxl otherwise) in chunks;
+# each chunk is split into columns and only the wanted ones are converted
+# straight to their target dtype. The frame comes out typed in one pass,
+# without a frame of objects and a separate astype over it.
+
+# Rows held as Python objects at a time, everything else is already typed
+CHUNK_ROWS = 10000
+
+
+def sheet_rows(path):
+    if CalamineWorkbook is not None:
+        return CalamineWorkbook.from_path(path).get_sheet_by_index(0).iter_rows()
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    return workbook.worksheets[0].iter_rows(values_only=True)
+
+
+def cell_text(value):
+    # Numbers in a text column read like pandas shows them: 123, not 123.0
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value)
+
+
+def convert(values, dtype):
+    # One column of a chunk, empty cells as None, to an array of `dtype`
+    if dtype == 'string':
+        return pd.array([value if value is None or isinstance(value, str) else cell_text(value) for value in values], dtype='string')
+    if dtype == 'datetime64[ns]':
+        return pd.to_datetime(pd.Series(values, dtype=object)).to_numpy(dtype='datetime64[ns]')
+    # Integer columns fail on empty cells, like astype('int') does
+    return np.array(values, dtype=pd.api.types.pandas_dtype(dtype))
+
+
+def read_typed(path, dtypes):
+    # Columns of `dtypes` (header names on the first row) in those dtypes
+    rows = iter(sheet_rows(path))
+    header = [None if name == '' else name for name in next(rows, ())]
+    missing = [column for column in dtypes if column not in header]
+    if missing:
+        raise ValueError(f"{path} has no column(s) {missing}")
+    positions = {column: header.index(column) for column in dtypes}
+
+    chunks = {column: [] for column in dtypes}
+    while True:
+        chunk = [row for _, row in zip(range(CHUNK_ROWS), rows)]
+        if not chunk:
+            break
+        # Blank rows (e.g. formatted cells below the data) are skipped like read_excel does
+        chunk = [row for row in chunk if any(cell is not None and cell != '' for cell in row)]
+        if not chunk:
+            continue
+        # Short rows (trailing empty cells) are padded before the split
+        width = len(header)
+        columns = list(zip(*(row if len(row) >= width else tuple(row) + (None,) * (width - len(row)) for row in chunk)))
+        for column, dtype in dtypes.items():
+            values = columns[positions[column]]
+            if '' in values:
+                values = [None if value == '' else value for value in values]
+            chunks[column].append(convert(values, dtype))
+
+    data = {}
+    for column, dtype in dtypes.items():
+        parts = chunks.pop(column)
+        if not parts:
+            data[column] = pd.Series(dtype=dtype)
+        elif dtype == 'string':
+            data[column] = pd.array(pd.concat([pd.Series(part) for part in parts], ignore_index=True))
+        else:
+            data[column] = np.concatenate(parts)
+    return pd.DataFrame(data)